@@ -13,7 +13,7 @@ with open("README.md") as f:
 with open('requirements/requirements.txt') as fp:
     install_requires = fp.read()
 extras_require = {}
-for extra in ['docs', 'tests']:
+for extra in ['docs', 'tests', 'extras']:
     with open('requirements/requirements-{0}.txt'.format(extra)) as fp:
         extras_require[extra] = fp.read()
 
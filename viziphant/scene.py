@@ -0,0 +1,411 @@
+"""
+Backend-neutral scene descriptions of the viziphant plots.
+
+A scene holds everything needed to draw a plot on a client (panel layout,
+axis limits and labels, line series, markers, thresholds, event markers and
+matrix images) without rendering it with matplotlib. Coordinates are stored
+as columnar numpy arrays, which are referenced by name from the panel
+descriptions, and the scene is serialized either as binary-packed JSON or as
+an Arrow IPC stream.
+"""
+# Copyright 2019-2020 by the Viziphant team, see `doc/authors.rst`.
+# License: Modified BSD, see LICENSE.txt for details.
+
+import json
+import struct
+
+import matplotlib.pyplot as plt
+import numpy as np
+import quantities as pq
+import scipy.sparse
+from matplotlib.colors import to_hex
+
+from viziphant.unitary_event_analysis import params_dict_default, \
+    _pattern_colors, _unitary_events_data
+
+SCENE_MAGIC = b'VZSC'
+SCENE_VERSION = 1
+# metadata key of the scene description in Arrow IPC streams
+ARROW_METADATA_KEY = b'viziphant.scene'
+
+
+class Scene(object):
+    """
+    Columnar description of a plot.
+
+    Parameters
+    ----------
+    layout : dict, optional
+        Figure-wide layout information, e.g. the figure size and margins.
+
+    Attributes
+    ----------
+    layout : dict
+        Figure-wide layout information.
+    panels : list of dict
+        The panels of the plot. Array-valued entries are the names of arrays
+        in `arrays`.
+    arrays : dict
+        The numpy arrays referenced by the panels.
+    """
+
+    def __init__(self, layout=None):
+        self.layout = dict(layout or {})
+        self.panels = []
+        self.arrays = {}
+
+    def add_array(self, name, values, dtype=np.float32):
+        """
+        Stores an array in the scene and returns its name, to be referenced
+        in a panel description.
+        """
+        self.arrays[name] = np.ascontiguousarray(values, dtype=dtype)
+        return name
+
+    def to_dict(self):
+        """
+        Returns the JSON-serializable part of the scene, i.e. everything but
+        the array contents.
+        """
+        return {
+            'version': SCENE_VERSION,
+            'layout': self.layout,
+            'panels': self.panels,
+            'arrays': {name: {'dtype': array.dtype.str,
+                              'shape': list(array.shape)}
+                       for name, array in self.arrays.items()},
+        }
+
+    def to_bytes(self):
+        """
+        Serializes the scene as binary-packed JSON.
+
+        The output consists of the 4-byte magic `SCENE_MAGIC`, the length of
+        the JSON header as little-endian uint32, the UTF-8 encoded JSON
+        header and the little-endian array data. The header and each array
+        are padded to multiples of 8 bytes, and the header lists the byte
+        offset of each array relative to the start of the data section.
+
+        Returns
+        -------
+        bytes
+            The serialized scene.
+        """
+        header = self.to_dict()
+        buffers = []
+        offset = 0
+        for name, array in self.arrays.items():
+            array = array.astype(array.dtype.newbyteorder('<'), copy=False)
+            header['arrays'][name].update(dtype=array.dtype.str,
+                                          offset=offset, nbytes=array.nbytes)
+            padding = -array.nbytes % 8
+            buffers.append(array.tobytes() + b'\0' * padding)
+            offset += array.nbytes + padding
+        header_bytes = json.dumps(header, separators=(',', ':')).encode(
+            'utf-8')
+        header_bytes += b' ' * (-len(header_bytes) % 8)
+        return b''.join([SCENE_MAGIC, struct.pack('<I', len(header_bytes)),
+                         header_bytes] + buffers)
+
+    @classmethod
+    def from_bytes(cls, buffer):
+        """
+        Reads a scene serialized with :meth:`to_bytes`. The arrays are
+        read-only views of `buffer`.
+        """
+        buffer = memoryview(buffer)
+        if bytes(buffer[:4]) != SCENE_MAGIC:
+            raise ValueError("The buffer does not contain a viziphant scene")
+        header_length, = struct.unpack('<I', buffer[4:8])
+        header = json.loads(bytes(buffer[8:8 + header_length]).decode(
+            'utf-8'))
+        data_start = 8 + header_length
+        scene = cls(layout=header['layout'])
+        scene.panels = header['panels']
+        for name, info in header['arrays'].items():
+            start = data_start + info['offset']
+            scene.arrays[name] = np.frombuffer(
+                buffer[start:start + info['nbytes']],
+                dtype=info['dtype']).reshape(info['shape'])
+        return scene
+
+    def to_arrow(self):
+        """
+        Serializes the scene as an Arrow IPC stream with a single record
+        batch. Each array is a column holding one list of its flattened
+        values; the scene description, including the array shapes, is stored
+        in the schema metadata under `ARROW_METADATA_KEY`.
+
+        Returns
+        -------
+        bytes
+            The serialized scene.
+
+        Raises
+        ------
+        ImportError
+            If `pyarrow` is not installed.
+        """
+        pa = _import_pyarrow()
+        columns = []
+        for array in self.arrays.values():
+            values = pa.array(array.ravel())
+            offsets = pa.array([0, len(values)], type=pa.int32())
+            columns.append(pa.ListArray.from_arrays(offsets, values))
+        batch = pa.RecordBatch.from_arrays(columns, names=list(self.arrays))
+        metadata = {ARROW_METADATA_KEY: json.dumps(self.to_dict())}
+        schema = batch.schema.with_metadata(metadata)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, schema) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue().to_pybytes()
+
+    @classmethod
+    def from_arrow(cls, buffer):
+        """
+        Reads a scene serialized with :meth:`to_arrow`.
+        """
+        pa = _import_pyarrow()
+        table = pa.ipc.open_stream(buffer).read_all()
+        header = json.loads(table.schema.metadata[ARROW_METADATA_KEY])
+        scene = cls(layout=header['layout'])
+        scene.panels = header['panels']
+        for name, info in header['arrays'].items():
+            values = table.column(name).chunk(0).values
+            scene.arrays[name] = values.to_numpy(
+                zero_copy_only=False).reshape(info['shape'])
+        return scene
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        raise ImportError("Arrow serialization of scenes requires "
+                          "'pyarrow'. Install it or use Scene.to_bytes().")
+    return pyarrow
+
+
+def unitary_events_scene(data, joint_surprise_dict, significance_level,
+                         binsize, window_size, window_step,
+                         **plot_params_user):
+    """
+    Describes the plot of
+    :func:`viziphant.unitary_event_analysis.plot_unitary_events` as a scene,
+    without drawing it.
+
+    The parameters are identical to those of
+    :func:`viziphant.unitary_event_analysis.plot_unitary_events`. Unlike the
+    plotting function, `data` is not modified.
+
+    Returns
+    -------
+    scene : Scene
+        The six panels 'spike_events', 'spike_rates', 'coincident_events',
+        'coincidence_rates', 'statistical_significance' and
+        'unitary_events', in this order. Series of pattern-specific data
+        carry the index of their pattern.
+
+    Examples
+    --------
+    >>> scene = unitary_events_scene(spiketrains, UE, significance_level=0.05,
+    ...                              binsize=5 * pq.ms,
+    ...                              window_size=100 * pq.ms,
+    ...                              window_step=10 * pq.ms)
+    >>> payload = scene.to_bytes()
+    """
+    params_dict = params_dict_default.copy()
+    params_dict.update(plot_params_user)
+    ue_data = _unitary_events_data(data, joint_surprise_dict,
+                                   significance_level, binsize, window_size,
+                                   window_step, params_dict)
+    n_trials = ue_data['n_trials']
+    n_neurons = ue_data['n_neurons']
+    n_patterns = ue_data['n_patterns']
+    xlim = [float(limit) for limit in ue_data['xlim']]
+    time_unit = params_dict['time_unit']
+    frequency_unit = params_dict['frequency_unit']
+
+    events = []
+    for name, event_times in params_dict['events'].items():
+        # a Quantity array or a list of Quantities, as in plot_unitary_events
+        event_times = np.array([
+            event_time.rescale(time_unit).item()
+            if isinstance(event_time, pq.Quantity) else float(event_time)
+            for event_time in event_times])
+        event_times = event_times[(event_times >= xlim[0]) &
+                                  (event_times <= xlim[1])]
+        events.append({'name': name, 'times': event_times.tolist()})
+
+    scene = Scene(layout={
+        'n_rows': 6,
+        'figsize': list(params_dict['figsize']),
+        'hspace': params_dict['hspace'],
+        'top': params_dict['top'],
+        'bottom': params_dict['bottom'],
+        'left': params_dict['left'],
+        'right': params_dict['right'],
+        'fsize': params_dict['fsize'],
+        'pattern_layout': params_dict['pattern_layout'],
+        'pattern_hash': [int(pattern_hash)
+                         for pattern_hash in ue_data['pattern_hash']],
+        'time_unit': time_unit,
+        'frequency_unit': frequency_unit,
+        'xlim': xlim,
+        'xlabel': f'Time ({time_unit})',
+        'events': events,
+        'event_color': to_hex('r'),
+    })
+    scene.add_array('raster_x', ue_data['raster'][0])
+    scene.add_array('raster_y', ue_data['raster'][1])
+    scene.add_array('window_centers', ue_data['window_centers'])
+
+    def raster_panel(name, title):
+        return {
+            'name': name,
+            'title': title,
+            'ylim': [0, (n_trials + 1) * n_neurons + 1],
+            'yticks': [n_trials, n_neurons * n_trials + 1],
+            'yticklabels': [str(n_trials), str(n_trials)],
+            'ylabel': 'Trial',
+            'hlines': [{'y': n_trials + 1, 'color': to_hex('k'),
+                        'lw': params_dict['lw']}],
+            'series': [{'type': 'markers', 'x': 'raster_x', 'y': 'raster_y',
+                        'marker': '.', 'size': 0.5,
+                        'color': to_hex('k')}],
+        }
+
+    spike_events = raster_panel('spike_events', 'Spike Events')
+
+    rate_series = []
+    scene.add_array('rate_times', ue_data['rate_times'])
+    for n in range(n_neurons):
+        rate_series.append({
+            'type': 'line', 'x': 'rate_times',
+            'y': scene.add_array(f'rates_{n}', ue_data['rates'][:, n]),
+            'label': f"Unit {params_dict['unit_real_ids'][n]}",
+            'lw': params_dict['lw']})
+    max_rate = float(ue_data['rates'].max())
+    spike_rates = {
+        'name': 'spike_rates', 'title': 'Spike Rates',
+        'ylim': [0, max_rate + max_rate / 10],
+        'ylabel': f'({frequency_unit})',
+        'series': rate_series,
+    }
+
+    pattern_colors = _pattern_colors(n_patterns)
+    coincident_events = raster_panel('coincident_events',
+                                     'Coincident Events')
+    unitary_events = raster_panel('unitary_events', 'Unitary Events')
+    coincidence_rates = {
+        'name': 'coincidence_rates', 'title': 'Coincidence Rates',
+        'ylabel': f'({frequency_unit})', 'series': []}
+    joint_surprise_significance = float(
+        ue_data['joint_surprise_significance'])
+    statistical_significance = {
+        'name': 'statistical_significance',
+        'title': 'Statistical Significance',
+        'ylim': list(params_dict['S_ylim']),
+        'thresholds': [
+            {'y': joint_surprise_significance, 'label': 'alpha +',
+             'color': to_hex('r')},
+            {'y': -joint_surprise_significance, 'label': 'alpha -',
+             'color': to_hex('g')}],
+        'series': []}
+    for pattern in range(n_patterns):
+        for key, panel, color_key in (
+                ('coincidences', coincident_events, 'coincidences'),
+                ('unitary_events', unitary_events, 'unitary_events')):
+            x, y = ue_data[key][pattern]
+            panel['series'].append({
+                'type': 'markers', 'pattern': pattern, 'marker': 's',
+                'x': scene.add_array(f'{key}_x_{pattern}', x),
+                'y': scene.add_array(f'{key}_y_{pattern}', y),
+                'size': params_dict['marker_size'], 'fill': None,
+                'color': to_hex(pattern_colors[color_key][pattern])})
+        for key, label, color_key, style in (
+                ('empirical_rates', 'Empirical', 'empirical', '-'),
+                ('expected_rates', 'Expected', 'expected',
+                 pattern_colors['expected_style'])):
+            coincidence_rates['series'].append({
+                'type': 'line', 'pattern': pattern, 'label': label,
+                'x': 'window_centers',
+                'y': scene.add_array(f'{key}_{pattern}',
+                                     ue_data[key][pattern]),
+                'lw': params_dict['lw'], 'ls': style,
+                'color': to_hex(pattern_colors[color_key][pattern])})
+        statistical_significance['series'].append({
+            'type': 'line', 'pattern': pattern, 'x': 'window_centers',
+            'y': scene.add_array(f'joint_surprise_{pattern}',
+                                 ue_data['joint_surprise'][pattern]),
+            'lw': params_dict['lw'],
+            'color': to_hex(pattern_colors['joint_surprise'][pattern])})
+
+    scene.panels = [spike_events, spike_rates, coincident_events,
+                    coincidence_rates, statistical_significance,
+                    unitary_events]
+    for row, panel in enumerate(scene.panels):
+        panel['row'] = row
+        panel['letter'] = 'ABCDEF'[row]
+    return scene
+
+
+def corrcoef_scene(correlation_coefficient_matrix, correlation_minimum=-1.,
+                   correlation_maximum=1., colormap='bwr', n_colors=256):
+    """
+    Describes the plot of
+    :func:`viziphant.spike_train_correlation.plot_corrcoef` as a scene,
+    without drawing it.
+
+    Dense matrices are stored as a float32 image, sparse matrices as the
+    columnar row, column and value arrays of their nonzero entries. The
+    colormap is stored as a lookup table of RGBA bytes that maps the range
+    [`correlation_minimum`, `correlation_maximum`] linearly onto its entries.
+
+    Parameters
+    ----------
+    correlation_coefficient_matrix : np.ndarray or scipy.sparse.spmatrix
+        Pearson's correlation coefficient matrix
+    correlation_minimum : float
+        minimum correlation for colour mapping. Default: -1
+    correlation_maximum : float
+        maximum correlation for colour mapping. Default: 1
+    colormap : str
+        colormap. Default: 'bwr'
+    n_colors : int
+        number of entries of the colormap lookup table. Default: 256
+
+    Returns
+    -------
+    scene : Scene
+        A single 'corrcoef' panel.
+    """
+    scene = Scene()
+    shape = correlation_coefficient_matrix.shape
+    panel = {
+        'name': 'corrcoef',
+        'row': 0,
+        'shape': list(shape),
+        'vmin': correlation_minimum,
+        'vmax': correlation_maximum,
+        'colormap': colormap,
+        'lut': scene.add_array(
+            'lut', plt.get_cmap(colormap, n_colors)(np.arange(n_colors),
+                                                    bytes=True),
+            dtype=np.uint8),
+    }
+    if scipy.sparse.issparse(correlation_coefficient_matrix):
+        matrix = correlation_coefficient_matrix.tocoo()
+        panel['series'] = [{
+            'type': 'sparse_matrix',
+            'row': scene.add_array('rows', matrix.row, dtype=np.int32),
+            'col': scene.add_array('cols', matrix.col, dtype=np.int32),
+            'value': scene.add_array('values', matrix.data)}]
+    else:
+        panel['series'] = [{
+            'type': 'image',
+            'image': scene.add_array('image',
+                                     correlation_coefficient_matrix)}]
+    scene.panels.append(panel)
+    return scene
@@ -7,15 +7,334 @@ Simple plotting function for spike train correlation measures
 
 from __future__ import division, print_function, unicode_literals
 
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import matplotlib.pyplot as plt
+import quantities as pq
+import scipy.fft
+import scipy.sparse
+from scipy.cluster.vq import kmeans2
+from scipy.sparse.linalg import LinearOperator, eigsh
+from matplotlib.collections import LineCollection, PathCollection
+from matplotlib.colors import ListedColormap
+from matplotlib.path import Path
 from mpl_toolkits.axes_grid1 import make_axes_locatable, axes_size
 
+import elephant.spike_train_correlation as stcorr
+from elephant.conversion import BinnedSpikeTrain
+from elephant.spike_train_surrogates import surrogates
+
+# fraction of display pixels above which sparse entries are aggregated into
+# an image instead of being drawn as individual markers
+SPARSE_MARKER_DENSITY = 0.05
+
+# number of rows assigned to the subsample clusters at once by
+# corrcoef_ordering, which bounds the memory of the assignment step
+ORDERING_CHUNK_SIZE = 1024
+
+CorrcoefOrdering = namedtuple('CorrcoefOrdering',
+                              ['permutation', 'boundaries'])
+
+
+def _sparse_display_shape(shape, axes):
+    """
+    Returns the shape of an image of the matrix at the display resolution of
+    the axes, never exceeding the matrix shape.
+    """
+    bbox = axes.get_window_extent()
+    n_rows = max(min(shape[0], int(round(bbox.height))), 1)
+    n_cols = max(min(shape[1], int(round(bbox.width))), 1)
+    return n_rows, n_cols
+
+
+def _plot_sparse_corrcoef(sparse_matrix, axes, rendering, **kwargs):
+    """
+    Draws the nonzero entries of a sparse matrix either as an image
+    aggregated to display resolution or as square markers. Memory scales with
+    the number of nonzero entries and the number of display pixels.
+    """
+    matrix = sparse_matrix.tocoo()
+    n_rows, n_cols = matrix.shape
+    display_shape = _sparse_display_shape(matrix.shape, axes)
+    if rendering == 'auto':
+        density = matrix.nnz / (display_shape[0] * display_shape[1])
+        if density > SPARSE_MARKER_DENSITY:
+            rendering = 'image'
+        else:
+            rendering = 'markers'
+
+    if rendering == 'image':
+        # keep the entry with the largest magnitude per display pixel
+        pixel_rows = matrix.row.astype(np.int64) * display_shape[0] // n_rows
+        pixel_cols = matrix.col.astype(np.int64) * display_shape[1] // n_cols
+        pixels = pixel_rows * display_shape[1] + pixel_cols
+        order = np.lexsort((np.abs(matrix.data), pixels))
+        pixels = pixels[order]
+        last_in_pixel = np.append(pixels[1:] != pixels[:-1], True)
+        image = np.zeros(display_shape, dtype=matrix.dtype)
+        image.flat[pixels[last_in_pixel]] = matrix.data[order][last_in_pixel]
+        return axes.imshow(image, extent=(-0.5, n_cols - 0.5,
+                                          n_rows - 0.5, -0.5),
+                           interpolation='nearest', **kwargs)
+    if rendering == 'markers':
+        bbox = axes.get_window_extent()
+        cell_points = min(bbox.width / n_cols, bbox.height / n_rows) * \
+            72. / axes.figure.dpi
+        collection = axes.scatter(matrix.col, matrix.row, c=matrix.data,
+                                  s=max(cell_points, 1.) ** 2, marker='s',
+                                  linewidths=0, **kwargs)
+        axes.set_xlim(-0.5, n_cols - 0.5)
+        axes.set_ylim(n_rows - 0.5, -0.5)
+        axes.set_aspect('equal')
+        return collection
+    raise ValueError(f"Unknown sparse rendering '{rendering}'. Use 'auto', "
+                     f"'image' or 'markers'.")
+
+
+def _mask_path(mask):
+    """
+    Returns a single path made of one rectangle per run of consecutive True
+    cells in each row of `mask`, in the coordinates of `axes.imshow`.
+    """
+    n_rows = mask.shape[0]
+    padded = np.zeros((n_rows, mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    changes = np.diff(padded, axis=1)
+    # both are in row-major order, so the k-th start and stop form a run
+    rows, starts = np.nonzero(changes == 1)
+    stops = np.nonzero(changes == -1)[1]
+    left, right = starts - 0.5, stops - 0.5
+    top, bottom = rows - 0.5, rows + 0.5
+    vertices = np.stack([
+        np.stack([left, top], axis=1), np.stack([right, top], axis=1),
+        np.stack([right, bottom], axis=1), np.stack([left, bottom], axis=1),
+        np.stack([left, top], axis=1)], axis=1).reshape(-1, 2)
+    codes = np.tile([Path.MOVETO, Path.LINETO, Path.LINETO, Path.LINETO,
+                     Path.CLOSEPOLY], len(rows)).astype(Path.code_type)
+    return Path(vertices, codes)
+
+
+def _plot_significance_mask(significance_mask, axes, mask_style):
+    """
+    Greys out or hatches the entries of a matrix plot where
+    `significance_mask` is False.
+    """
+    not_significant = ~np.asarray(significance_mask, dtype=bool)
+    n_rows, n_cols = not_significant.shape
+    if mask_style == 'grey':
+        axes.imshow(np.ma.masked_where(~not_significant, not_significant),
+                    cmap=ListedColormap(['0.6']), interpolation='nearest',
+                    extent=(-0.5, n_cols - 0.5, n_rows - 0.5, -0.5))
+    elif mask_style == 'hatch':
+        # the image already sets the data limits; computing them from the
+        # path would iterate over every run in Python
+        axes.add_collection(PathCollection([_mask_path(not_significant)],
+                                           facecolors='none', edgecolors='k',
+                                           linewidths=0, hatch='////'),
+                            autolim=False)
+    else:
+        raise ValueError(f"Unknown mask style '{mask_style}'. Use 'grey' "
+                         f"or 'hatch'.")
+
+
+def _affinity_product(matrix):
+    """
+    Returns a function multiplying the affinity between neurons, i.e. the
+    absolute correlation coefficients without the diagonal, with a 2D array.
+    Undefined coefficients have no affinity. Dense matrices are processed in
+    row chunks instead of being copied.
+    """
+    if scipy.sparse.issparse(matrix):
+        affinity = abs(matrix.tocsr()).astype(np.float64)
+        affinity.data = np.nan_to_num(affinity.data)
+        affinity.setdiag(0)
+        affinity.eliminate_zeros()
+        return lambda vectors: affinity @ vectors
+
+    matrix = np.asarray(matrix)
+
+    def product(vectors):
+        result = np.empty((matrix.shape[0], vectors.shape[1]))
+        for start in range(0, matrix.shape[0], ORDERING_CHUNK_SIZE):
+            rows = slice(start, start + ORDERING_CHUNK_SIZE)
+            result[rows] = np.abs(np.nan_to_num(matrix[rows])) @ vectors
+        diagonal = np.abs(np.nan_to_num(np.diagonal(matrix)))
+        return result - diagonal[:, np.newaxis] * vectors
+
+    return product
+
+
+def _spectral_embedding(matrix, n_clusters, seed):
+    """
+    Returns the top `n_clusters` eigenvectors of the normalized affinity
+    matrix, ordered by decreasing eigenvalue. Only products with the
+    affinity are needed, never a factorization.
+    """
+    affinity_product = _affinity_product(matrix)
+    n_neurons = matrix.shape[0]
+    degree = affinity_product(np.ones((n_neurons, 1))).ravel()
+    degree_inv_sqrt = np.zeros_like(degree)
+    degree_inv_sqrt[degree > 0] = 1. / np.sqrt(degree[degree > 0])
+
+    def normalized_product(vectors):
+        vectors = vectors.reshape(n_neurons, -1)
+        return degree_inv_sqrt[:, np.newaxis] * affinity_product(
+            degree_inv_sqrt[:, np.newaxis] * vectors)
+
+    if n_clusters >= n_neurons - 1:
+        # too small for the iterative solver
+        eigenvectors = np.linalg.eigh(normalized_product(np.eye(n_neurons)))[1]
+    else:
+        normalized = LinearOperator((n_neurons, n_neurons),
+                                    matvec=normalized_product,
+                                    matmat=normalized_product,
+                                    dtype=np.float64)
+        v0 = np.random.RandomState(seed).uniform(-1, 1, n_neurons)
+        eigenvectors = eigsh(normalized, k=n_clusters, which='LA', v0=v0)[1]
+    return eigenvectors[:, ::-1][:, :n_clusters]
+
+
+def _spectral_ordering(matrix, n_clusters, seed):
+    """
+    Clusters the rows of the normalized spectral embedding. The members of
+    a cluster are ordered by the first nontrivial eigenvector.
+    """
+    embedding = _spectral_embedding(matrix, n_clusters, seed)
+    norms = np.linalg.norm(embedding, axis=1, keepdims=True)
+    norms[norms == 0] = 1.
+    centroids, labels = kmeans2(embedding / norms, n_clusters, minit='++',
+                                seed=seed)
+    fiedler = embedding[:, min(1, embedding.shape[1] - 1)]
+    return labels, centroids, fiedler
+
+
+def _subsample_ordering(matrix, n_clusters, n_subsample, seed):
+    """
+    Clusters the correlation profiles of a random subsample of neurons and
+    assigns all neurons, chunk by chunk, to the nearest cluster centroid.
+    The profile of a neuron is its correlation with the subsampled neurons
+    and the members of a cluster are ordered by their distance to the
+    centroid.
+    """
+    n_neurons = matrix.shape[0]
+    random_state = np.random.RandomState(seed)
+    subsample = np.sort(random_state.choice(
+        n_neurons, min(n_subsample, n_neurons), replace=False))
+    if scipy.sparse.issparse(matrix):
+        matrix = matrix.tocsr()
+        columns = matrix[:, subsample].tocsr()
+    else:
+        columns = np.asarray(matrix)[:, subsample]
+
+    def profiles(rows):
+        chunk = columns[rows]
+        if scipy.sparse.issparse(chunk):
+            chunk = chunk.toarray()
+        return np.nan_to_num(np.asarray(chunk, dtype=np.float64))
+
+    centroids, _ = kmeans2(profiles(subsample), n_clusters, minit='++',
+                           seed=seed)
+    labels = np.empty(n_neurons, dtype=np.int64)
+    distances = np.empty(n_neurons)
+    for start in range(0, n_neurons, ORDERING_CHUNK_SIZE):
+        rows = np.arange(start, min(start + ORDERING_CHUNK_SIZE, n_neurons))
+        chunk = profiles(rows)
+        squared_distances = (chunk ** 2).sum(axis=1)[:, np.newaxis] - \
+            2 * chunk @ centroids.T + (centroids ** 2).sum(axis=1)
+        labels[rows] = squared_distances.argmin(axis=1)
+        distances[rows] = squared_distances.min(axis=1)
+    return labels, centroids, distances
+
+
+def _chain_clusters(centroids):
+    """
+    Returns the rank of each cluster along a greedy nearest-neighbour path
+    through the centroids, so that similar clusters become adjacent. The
+    path starts at the centroid farthest from all others.
+    """
+    distances = np.linalg.norm(centroids[:, np.newaxis] -
+                               centroids[np.newaxis, :], axis=-1)
+    path = [int(distances.sum(axis=1).argmax())]
+    unvisited = set(range(len(centroids))) - set(path)
+    while unvisited:
+        nearest = min(unvisited, key=lambda cluster: distances[path[-1],
+                                                               cluster])
+        path.append(nearest)
+        unvisited.remove(nearest)
+    rank = np.empty(len(centroids), dtype=np.int64)
+    rank[path] = np.arange(len(centroids))
+    return rank
+
+
+def corrcoef_ordering(correlation_coefficient_matrix, method='spectral',
+                      n_clusters=8, n_subsample=1000, seed=None):
+    """
+    Computes a permutation of the neurons that groups similarly correlated
+    neurons into contiguous blocks, to be passed as `reorder` to
+    :func:`plot_corrcoef`.
+
+    Both methods scale to many thousands of neurons, unlike hierarchical
+    clustering with optimal leaf ordering. 'spectral' clusters the top
+    `n_clusters` eigenvectors of the normalized absolute correlation matrix,
+    which are computed iteratively from matrix-vector products. 'subsample'
+    clusters the correlation profiles of `n_subsample` randomly chosen
+    neurons with k-means and assigns all neurons to the nearest cluster.
+
+    Parameters
+    ----------
+    correlation_coefficient_matrix : np.ndarray or scipy.sparse.spmatrix
+        Pearson's correlation coefficient matrix.
+    method : {'spectral', 'subsample'}
+        The ordering algorithm. Default: 'spectral'
+    n_clusters : int
+        The number of clusters. Default: 8
+    n_subsample : int
+        The number of neurons clustered by the 'subsample' method.
+        Default: 1000
+    seed : int or None
+        The seed of the random initializations. Default: None
+
+    Returns
+    -------
+    ordering : CorrcoefOrdering
+        The named tuple of the `permutation` of the neurons and the
+        `boundaries`, i.e. the positions in the permuted matrix where a new
+        cluster starts.
+    """
+    n_neurons = correlation_coefficient_matrix.shape[0]
+    n_clusters = max(min(n_clusters, n_neurons), 1)
+    if method == 'spectral':
+        labels, centroids, member_keys = _spectral_ordering(
+            correlation_coefficient_matrix, n_clusters, seed)
+    elif method == 'subsample':
+        labels, centroids, member_keys = _subsample_ordering(
+            correlation_coefficient_matrix, n_clusters, n_subsample, seed)
+    else:
+        raise ValueError(f"Unknown ordering method '{method}'. Use "
+                         f"'spectral' or 'subsample'.")
+    cluster_rank = _chain_clusters(centroids)
+    permutation = np.lexsort((member_keys, cluster_rank[labels]))
+    sorted_labels = labels[permutation]
+    boundaries = np.flatnonzero(sorted_labels[1:] != sorted_labels[:-1]) + 1
+    return CorrcoefOrdering(permutation, boundaries)
+
+
+def _permute_matrix(matrix, permutation):
+    """
+    Permutes the rows and columns of a dense or sparse matrix.
+    """
+    if scipy.sparse.issparse(matrix):
+        return matrix.tocsr()[permutation][:, permutation]
+    return np.asarray(matrix)[np.ix_(permutation, permutation)]
+
 
 def plot_corrcoef(
         correlation_coefficient_matrix, axes, correlation_minimum=-1.,
         correlation_maximum=1., colormap='bwr', color_bar_aspect=20,
-        color_bar_padding_fraction=.5):
+        color_bar_padding_fraction=.5, sparse_rendering='auto',
+        significance_mask=None, mask_style='grey', reorder=None):
 
     """
     Plots the cross-correlation matrix returned by
@@ -24,8 +343,10 @@ def plot_corrcoef(
 
     Parameters
     ----------
-    correlation_coefficient_matrix : np.ndarray
-        Pearson's correlation coefficient matrix
+    correlation_coefficient_matrix : np.ndarray or scipy.sparse.spmatrix
+        Pearson's correlation coefficient matrix. Sparse (e.g. thresholded)
+        matrices are drawn without densification; only their nonzero entries
+        are rendered.
     axes : object
         Matplotlib figure Axes
     correlation_minimum : float
@@ -39,6 +360,35 @@ def plot_corrcoef(
     color_bar_padding_fraction : float
         padding between matrix plot and color bar relative to color bar width.
         Default: .5
+    sparse_rendering : {'auto', 'image', 'markers'}
+        How a sparse matrix is drawn. 'image' aggregates the nonzero entries
+        into an image at the display resolution of `axes`, keeping the entry
+        of largest magnitude per pixel. 'markers' draws one square marker per
+        nonzero entry. 'auto' picks 'markers' if the nonzero entries cover
+        less than `SPARSE_MARKER_DENSITY` of the display pixels and 'image'
+        otherwise. Ignored for dense matrices.
+        Default: 'auto'
+    significance_mask : np.ndarray of bool or None
+        If given, the entries where the mask is False are marked as not
+        significant, e.g. with the mask returned by
+        :func:`corrcoef_significance_mask`.
+        Default: None
+    mask_style : {'grey', 'hatch'}
+        Whether non-significant entries are greyed out or hatched.
+        Default: 'grey'
+    reorder : {None, 'spectral', 'subsample'} or CorrcoefOrdering
+        If given, the rows and columns are reordered to group similarly
+        correlated neurons and the cluster boundaries are drawn. A string
+        selects the method of :func:`corrcoef_ordering` with its default
+        parameters; the ordering returned by a previous call can be passed
+        to re-plot without recomputing it.
+        Default: None
+
+    Returns
+    -------
+    ordering : CorrcoefOrdering or None
+        The ordering of the rows and columns if `reorder` is given, None
+        otherwise.
 
     Examples
     --------
@@ -51,11 +401,59 @@ def plot_corrcoef(
     ...
     >>> plot_corrcoef(correlation_coefficient_matrix, axes=ax)
 
+    Grey out the entries that are not significant against dithered
+    surrogates of the spike trains `spiketrains` that were used to compute
+    the matrix.
+
+    >>> mask = corrcoef_significance_mask(spiketrains, bin_size=5 * pq.ms)
+    >>> plot_corrcoef(correlation_coefficient_matrix, axes=ax,
+    ...               significance_mask=mask)
+
+    Group similarly correlated neurons and reuse the ordering for another
+    matrix of the same neurons.
+
+    >>> ordering = plot_corrcoef(correlation_coefficient_matrix, axes=ax,
+    ...                          reorder='spectral')
+    >>> plot_corrcoef(other_matrix, axes=ax2, reorder=ordering)
+
     """
 
-    image = axes.imshow(correlation_coefficient_matrix,
-                        vmin=correlation_minimum, vmax=correlation_maximum,
-                        cmap=colormap)
+    ordering = reorder
+    if isinstance(reorder, str):
+        ordering = corrcoef_ordering(correlation_coefficient_matrix,
+                                     method=reorder)
+    if ordering is not None:
+        if len(ordering.permutation) != \
+                correlation_coefficient_matrix.shape[0]:
+            raise ValueError(
+                f"The ordering has {len(ordering.permutation)} entries, but "
+                f"the matrix has {correlation_coefficient_matrix.shape[0]} "
+                f"rows.")
+        correlation_coefficient_matrix = _permute_matrix(
+            correlation_coefficient_matrix, ordering.permutation)
+        if significance_mask is not None:
+            significance_mask = _permute_matrix(significance_mask,
+                                                ordering.permutation)
+
+    if scipy.sparse.issparse(correlation_coefficient_matrix):
+        image = _plot_sparse_corrcoef(
+            correlation_coefficient_matrix, axes, sparse_rendering,
+            vmin=correlation_minimum, vmax=correlation_maximum,
+            cmap=colormap)
+    else:
+        image = axes.imshow(correlation_coefficient_matrix,
+                            vmin=correlation_minimum,
+                            vmax=correlation_maximum, cmap=colormap)
+
+    if significance_mask is not None:
+        _plot_significance_mask(significance_mask, axes, mask_style)
+
+    if ordering is not None and len(ordering.boundaries) > 0:
+        n_neurons = correlation_coefficient_matrix.shape[0]
+        axes.hlines(ordering.boundaries - 0.5, -0.5, n_neurons - 0.5,
+                    colors='k', linewidths=0.5)
+        axes.vlines(ordering.boundaries - 0.5, -0.5, n_neurons - 0.5,
+                    colors='k', linewidths=0.5)
 
     # Initialise colour bar axis
     divider = make_axes_locatable(axes)
@@ -64,3 +462,318 @@ def plot_corrcoef(
     cax = divider.append_axes("right", size=width, pad=pad)
 
     plt.colorbar(image, cax=cax)
+
+    return ordering
+
+
+# number of correlogram segments processed by one task of
+# _cross_correlograms, which bounds the memory of the segment spectra
+CCH_SEGMENTS_PER_TASK = 64
+
+
+def _cross_spectra(binned_block, rows, segment_length, max_lag, n_fft):
+    """
+    Returns the cross-spectra between the neurons `rows` and all neurons,
+    summed over the segments of a block of bins.
+
+    The block holds consecutive segments of `segment_length` bins with
+    `max_lag` bins of context on both sides. Within each segment, the spikes
+    of neuron i are correlated with the spikes of neuron j in the segment
+    extended by `max_lag` bins on both sides, so that summing the segment
+    correlograms yields the full correlogram for lags up to `max_lag`.
+
+    Returns
+    -------
+    np.ndarray
+        The cross-spectra of shape (n_frequencies, len(rows), n_neurons).
+    """
+    n_segments = (binned_block.shape[1] - 2 * max_lag) // segment_length
+    extended = np.arange(n_segments)[:, np.newaxis] * segment_length + \
+        np.arange(segment_length + 2 * max_lag)
+    spectra_j = scipy.fft.rfft(binned_block[:, extended], n=n_fft, axis=2)
+    spectra_i = scipy.fft.rfft(
+        binned_block[rows][:, extended[:, max_lag:max_lag + segment_length]],
+        n=n_fft, axis=2)
+    # one matrix product over segments per frequency covers all pairs
+    return np.matmul(np.conj(spectra_i).transpose(2, 0, 1),
+                     spectra_j.transpose(2, 1, 0))
+
+
+def _cross_spectra_task(task):
+    return _cross_spectra(*task)
+
+
+def _cross_correlograms(binned_spiketrains, max_lag, n_jobs=1,
+                        chunk_size=64):
+    """
+    Computes the cross-correlograms of all pairs of rows of a binned spike
+    train matrix with lags from -max_lag to max_lag bins. Entry k of the
+    correlogram of (i, j) counts the spike pairs in which neuron j fires k
+    bins after neuron i.
+
+    The spike trains are cut into short segments whose FFTs are multiplied
+    for all pairs at once and summed over segments, so that only one short
+    inverse FFT per pair is needed. The pairs are processed in chunks of
+    `chunk_size` rows and the segments in groups of `CCH_SEGMENTS_PER_TASK`,
+    optionally in a process pool. Besides the result, memory holds the
+    cross-spectrum of a single chunk of rows at a time, which is
+    proportional to `chunk_size` times the number of neurons. Each chunk
+    recomputes the segment FFTs of all neurons, so that their cost grows
+    with `n_neurons / chunk_size` and dominates for small chunks.
+
+    Returns
+    -------
+    np.ndarray
+        The correlograms of shape (n_neurons, n_neurons, 2 * max_lag + 1).
+    """
+    binned_spiketrains = np.asarray(binned_spiketrains, dtype=float)
+    n_neurons, n_bins = binned_spiketrains.shape
+    segment_length = max(4 * max_lag, 32)
+    # zero padding avoids circular wrap-around within the lag range
+    n_fft = scipy.fft.next_fast_len(segment_length + 2 * max_lag, real=True)
+    n_segments = -(-n_bins // segment_length)
+    padded = np.zeros((n_neurons, n_segments * segment_length + 2 * max_lag))
+    padded[:, max_lag:max_lag + n_bins] = binned_spiketrains
+
+    row_chunks = [np.arange(start, min(start + chunk_size, n_neurons))
+                  for start in range(0, n_neurons, chunk_size)]
+    group_bins = CCH_SEGMENTS_PER_TASK * segment_length
+    group_starts = range(0, n_segments * segment_length, group_bins)
+    tasks = [(padded[:, start:start + group_bins + 2 * max_lag], rows,
+              segment_length, max_lag, n_fft)
+             for rows in row_chunks for start in group_starts]
+
+    cch = np.empty((n_neurons, n_neurons, 2 * max_lag + 1))
+    # the tasks are ordered by chunk of rows, so each chunk is transformed
+    # back and its cross-spectrum dropped as soon as its last segment group
+    # has been added
+    results = _ordered_results(_cross_spectra_task, tasks, n_jobs)
+    for rows in row_chunks:
+        cross_spectrum = next(results)
+        for _ in range(len(group_starts) - 1):
+            cross_spectrum += next(results)
+        correlograms = scipy.fft.irfft(cross_spectrum, n=n_fft, axis=0)
+        del cross_spectrum
+        cch[rows] = np.rint(correlograms[:2 * max_lag + 1].transpose(1, 2, 0))
+    return cch
+
+
+def _ordered_results(function, tasks, n_jobs):
+    """
+    Yields the results of `function` for each task in order, from a process
+    pool if `n_jobs` > 1. At most 2 * `n_jobs` tasks are pending at a time,
+    so that finished results do not pile up in memory.
+    """
+    if n_jobs == 1:
+        for task in tasks:
+            yield function(task)
+        return
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(function, task))
+            if len(pending) >= 2 * n_jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def plot_cross_correlogram_grid(
+        spiketrains, bin_size, max_lag, axes, n_jobs=1, chunk_size=64,
+        color='k', linewidth=0.5):
+    """
+    Plots the cross-correlograms of all pairs of spike trains as an N x N
+    grid in a single axes.
+
+    The correlograms of all pairs are computed together from FFTs of short
+    segments of the binned spike trains and drawn as one `LineCollection`,
+    so that the number of artists does not grow with the number of pairs. Cell
+    (i, j) shows the correlogram of neuron j relative to neuron i, i.e.
+    positive lags mean that neuron j fires after neuron i. Each correlogram
+    is scaled to its own maximum, and the zero-lag bin of the
+    auto-correlograms on the diagonal is omitted.
+
+    Parameters
+    ----------
+    spiketrains : list of neo.SpikeTrain
+        The spike trains of the population, sharing t_start and t_stop.
+    bin_size : quantities.Quantity
+        The bin size used to bin the spike trains.
+    max_lag : int
+        The maximal lag of the correlograms, in bins.
+    axes : object
+        Matplotlib figure Axes
+    n_jobs : int
+        The number of processes computing chunks of pairs in parallel.
+        Default: 1
+    chunk_size : int
+        The number of neurons i whose pairs (i, j) with all neurons j are
+        computed by one task. The memory besides the result is proportional
+        to `chunk_size` (times `n_jobs` with a process pool), while smaller
+        chunks repeat the FFTs of all spike trains more often.
+        Default: 64
+    color : str
+        The color of the correlograms. Default: 'k'
+    linewidth : float
+        The line width of the correlograms. Default: 0.5
+
+    Returns
+    -------
+    cross_correlograms : np.ndarray
+        The correlograms of shape (N, N, 2 * max_lag + 1), in spike pair
+        counts, with lags from -max_lag to max_lag.
+
+    Examples
+    --------
+    >>> fig, ax = plt.subplots(1, 1, figsize=(10, 10))
+    >>> plot_cross_correlogram_grid(spiketrains, bin_size=1 * pq.ms,
+    ...                             max_lag=50, axes=ax)
+
+    """
+    binned_spiketrains = BinnedSpikeTrain(spiketrains,
+                                          binsize=bin_size).to_array()
+    cch = _cross_correlograms(binned_spiketrains, max_lag, n_jobs=n_jobs,
+                              chunk_size=chunk_size)
+    n_neurons = len(spiketrains)
+    n_lags = 2 * max_lag + 1
+
+    traces = cch.copy()
+    diagonal = np.arange(n_neurons)
+    traces[diagonal, diagonal, max_lag] = np.nan
+    maxima = np.nanmax(traces, axis=2, keepdims=True)
+    maxima[~(maxima > 0)] = 1
+    traces /= maxima
+
+    # place each correlogram in its cell, leaving a margin of `pad`
+    pad = 0.05
+    rows, cols = np.meshgrid(diagonal, diagonal, indexing='ij')
+    x = cols[..., np.newaxis] + pad + \
+        np.linspace(0, 1 - 2 * pad, n_lags)
+    y = rows[..., np.newaxis] + 1 - pad - traces * (1 - 2 * pad)
+    segments = np.stack([x, y], axis=-1).reshape(-1, n_lags, 2)
+    axes.add_collection(LineCollection(segments, colors=color,
+                                       linewidths=linewidth))
+
+    edges = np.arange(n_neurons + 1)
+    grid = [[(edge, 0), (edge, n_neurons)] for edge in edges] + \
+        [[(0, edge), (n_neurons, edge)] for edge in edges]
+    axes.add_collection(LineCollection(grid, colors='0.8', linewidths=0.5,
+                                       zorder=0))
+
+    axes.set_xlim(0, n_neurons)
+    axes.set_ylim(n_neurons, 0)
+    tick_step = max(n_neurons // 10, 1)
+    ticks = np.arange(0, n_neurons, tick_step)
+    axes.set_xticks(ticks + 0.5)
+    axes.set_xticklabels(ticks)
+    axes.set_yticks(ticks + 0.5)
+    axes.set_yticklabels(ticks)
+    axes.set_xlabel('Neuron j')
+    axes.set_ylabel('Neuron i')
+    return cch
+
+
+def _surrogate_exceedances(spiketrains, bin_size, correlation_magnitude,
+                           n_surrogates, surrogate_method, dt, seed):
+    """
+    Counts, for each entry of the correlation matrix, the surrogates whose
+    absolute correlation coefficient reaches the empirical one. Only one
+    surrogate matrix is held in memory at a time. The global random state,
+    which the surrogates are drawn from, is restored afterwards.
+    """
+    random_state = np.random.get_state()
+    np.random.seed(seed)
+    try:
+        surrogate_spiketrains = [
+            surrogates(spiketrain, n_surrogates, surrogate_method, dt)
+            for spiketrain in spiketrains]
+    finally:
+        np.random.set_state(random_state)
+    exceedances = np.zeros(correlation_magnitude.shape, dtype=np.int32)
+    for surrogate in range(n_surrogates):
+        surrogate_correlation = stcorr.corrcoef(BinnedSpikeTrain(
+            [spiketrain_surrogates[surrogate]
+             for spiketrain_surrogates in surrogate_spiketrains],
+            binsize=bin_size))
+        exceedances += np.abs(surrogate_correlation) >= correlation_magnitude
+    return exceedances
+
+
+def _surrogate_exceedances_task(task):
+    return _surrogate_exceedances(*task)
+
+
+def corrcoef_significance_mask(
+        spiketrains, bin_size, n_surrogates=100, significance_level=0.05,
+        surrogate_method='dither_spikes', dt=15 * pq.ms, n_jobs=1,
+        chunk_size=10):
+    """
+    Tests each entry of the correlation coefficient matrix of `spiketrains`
+    against surrogates of the spike trains and returns which entries are
+    significant, to be passed to :func:`plot_corrcoef`.
+
+    The p-value of an entry is estimated as (k + 1) / (n_surrogates + 1),
+    where k is the number of surrogates whose absolute correlation
+    coefficient reaches the empirical absolute value (two-sided test). Hence
+    no entry can be significant unless `n_surrogates` is larger than
+    1 / `significance_level` - 1.
+
+    Instead of storing all surrogate matrices, the surrogates are generated
+    and evaluated in chunks, optionally across a process pool, and each
+    chunk only accumulates the number of exceedances per entry, so that
+    memory stays O(N^2) regardless of `n_surrogates`. The chunks draw their
+    seeds from the global random state but leave it otherwise untouched.
+
+    Parameters
+    ----------
+    spiketrains : list of neo.SpikeTrain
+        The spike trains from which the correlation coefficient matrix is
+        computed.
+    bin_size : quantities.Quantity
+        The bin size used to compute the correlation coefficients.
+    n_surrogates : int
+        The number of surrogates. Default: 100
+    significance_level : float
+        The significance level of the test. Default: 0.05
+    surrogate_method : str
+        The method of :func:`elephant.spike_train_surrogates.surrogates`.
+        Default: 'dither_spikes'
+    dt : quantities.Quantity
+        The dithering or jittering parameter of the surrogate method.
+        Default: 15 ms
+    n_jobs : int
+        The number of processes evaluating chunks of surrogates in parallel.
+        Default: 1
+    chunk_size : int
+        The number of surrogates evaluated per chunk. Default: 10
+
+    Returns
+    -------
+    significance_mask : np.ndarray of bool
+        True where the correlation coefficient is significant. The diagonal
+        is always True.
+    """
+    correlation_magnitude = np.abs(stcorr.corrcoef(BinnedSpikeTrain(
+        spiketrains, binsize=bin_size)))
+    # draw the seeds from the global random state, so that the result
+    # depends on np.random.seed but not on n_jobs
+    chunk_sizes = [min(chunk_size, n_surrogates - start)
+                   for start in range(0, n_surrogates, chunk_size)]
+    seeds = np.random.randint(2 ** 31, size=len(chunk_sizes))
+    tasks = [(spiketrains, bin_size, correlation_magnitude, n_chunk,
+              surrogate_method, dt, seed)
+             for n_chunk, seed in zip(chunk_sizes, seeds)]
+    exceedances = np.zeros(correlation_magnitude.shape, dtype=np.int64)
+    if n_jobs == 1:
+        for task in tasks:
+            exceedances += _surrogate_exceedances_task(task)
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            for result in pool.map(_surrogate_exceedances_task, tasks):
+                exceedances += result
+    p_values = (exceedances + 1) / (n_surrogates + 1)
+    significance_mask = (p_values < significance_level) & \
+        np.isfinite(correlation_magnitude)
+    # the diagonal is trivially one and is not tested
+    np.fill_diagonal(significance_mask, True)
+    return significance_mask
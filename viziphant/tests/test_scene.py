@@ -0,0 +1,95 @@
+import unittest
+
+import numpy as np
+import quantities as pq
+import scipy.sparse
+
+import elephant.unitary_event_analysis as ue
+from viziphant.scene import Scene, corrcoef_scene, unitary_events_scene
+from viziphant.tests.utils.utils import generate_spiketrains
+
+try:
+    import pyarrow  # noqa: F401
+    HAVE_PYARROW = True
+except ImportError:
+    HAVE_PYARROW = False
+
+
+class SceneTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.spiketrains = generate_spiketrains(n_trials=10, n_spikes=100)
+        cls.UE = ue.jointJ_window_analysis(
+            cls.spiketrains, 5 * pq.ms, winsize=100 * pq.ms,
+            winstep=10 * pq.ms, pattern_hash=[3])
+
+    def _unitary_events_scene(self):
+        return unitary_events_scene(
+            self.spiketrains, self.UE, significance_level=0.05,
+            binsize=5 * pq.ms, window_size=100 * pq.ms,
+            window_step=10 * pq.ms, events={'Vision': [500] * pq.ms})
+
+    def assertScenesEqual(self, scene, target):
+        self.assertEqual(scene.layout, target.layout)
+        self.assertEqual(scene.panels, target.panels)
+        self.assertEqual(scene.arrays.keys(), target.arrays.keys())
+        for name, array in target.arrays.items():
+            np.testing.assert_array_equal(scene.arrays[name], array)
+
+    def test_unitary_events_scene(self):
+        scene = self._unitary_events_scene()
+        self.assertEqual([panel['name'] for panel in scene.panels],
+                         ['spike_events', 'spike_rates', 'coincident_events',
+                          'coincidence_rates', 'statistical_significance',
+                          'unitary_events'])
+        n_spikes = sum(len(spiketrain) for trial in self.spiketrains
+                       for spiketrain in trial)
+        self.assertEqual(len(scene.arrays['raster_x']), n_spikes)
+        self.assertEqual(scene.layout['events'],
+                         [{'name': 'Vision', 'times': [500.]}])
+        np.testing.assert_array_almost_equal(
+            scene.arrays['joint_surprise_0'], self.UE['Js'], decimal=5)
+        # the spike trains are not rescaled in place
+        self.assertEqual(self.spiketrains[0][0].units, pq.ms)
+
+    def test_events_as_list_of_quantities(self):
+        scene = unitary_events_scene(
+            self.spiketrains, self.UE, significance_level=0.05,
+            binsize=5 * pq.ms, window_size=100 * pq.ms,
+            window_step=10 * pq.ms,
+            events={'Vision': [500 * pq.ms, 0.7 * pq.s, 2 * pq.s]})
+        self.assertEqual(scene.layout['events'],
+                         [{'name': 'Vision', 'times': [500., 700.]}])
+
+    def test_bytes_round_trip(self):
+        scene = self._unitary_events_scene()
+        payload = scene.to_bytes()
+        self.assertEqual(payload[:4], b'VZSC')
+        self.assertScenesEqual(Scene.from_bytes(payload), scene)
+
+    @unittest.skipUnless(HAVE_PYARROW, "requires pyarrow")
+    def test_arrow_round_trip(self):
+        scene = self._unitary_events_scene()
+        self.assertScenesEqual(Scene.from_arrow(scene.to_arrow()), scene)
+
+    def test_corrcoef_scene(self):
+        matrix = np.array([[1., 0.2], [0.2, 1.]])
+        scene = corrcoef_scene(matrix)
+        np.testing.assert_array_almost_equal(scene.arrays['image'], matrix)
+        self.assertEqual(scene.arrays['lut'].shape, (256, 4))
+        self.assertEqual(scene.arrays['lut'].dtype, np.uint8)
+
+    def test_corrcoef_scene_sparse(self):
+        matrix = scipy.sparse.random(50, 50, density=0.05, random_state=0)
+        scene = Scene.from_bytes(corrcoef_scene(matrix).to_bytes())
+        coo = matrix.tocoo()
+        self.assertEqual(scene.panels[0]['series'][0]['type'],
+                         'sparse_matrix')
+        np.testing.assert_array_equal(scene.arrays['rows'], coo.row)
+        np.testing.assert_array_equal(scene.arrays['cols'], coo.col)
+        np.testing.assert_array_almost_equal(scene.arrays['values'],
+                                             coo.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
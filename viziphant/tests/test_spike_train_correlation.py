@@ -2,9 +2,16 @@ import io
 import unittest
 
 import matplotlib.pyplot as plt
+import neo
+import numpy as np
+import quantities as pq
+import scipy.sparse
 import seaborn
 
-from viziphant.spike_train_correlation import plot_corrcoef
+from elephant.spike_train_generation import homogeneous_poisson_process
+from viziphant.spike_train_correlation import plot_corrcoef, \
+    plot_cross_correlogram_grid, corrcoef_significance_mask, \
+    corrcoef_ordering, CorrcoefOrdering, _cross_correlograms
 from viziphant.tests.create_target.target_spike_train_correlation \
     import CORRCOEF_TARGET_PATH, get_default_corrcoef_matrix, \
     create_target_plot_correlation_coefficient
@@ -35,6 +42,210 @@ class SpikeTrainCorrelationTestCase(unittest.TestCase):
         tolerance = 1e-3
         self.assertLessEqual(diff_norm, tolerance)
 
+    def test_corrcoef_sparse_image(self):
+        dense = np.diag(np.ones(10))
+        dense[2, 7] = dense[7, 2] = -0.4
+        fig, axes = plt.subplots(1, 1)
+        plot_corrcoef(scipy.sparse.csr_matrix(dense), axes,
+                      sparse_rendering='image')
+        # the matrix is smaller than the display, so the image is exact
+        np.testing.assert_array_equal(axes.images[0].get_array(), dense)
+        plt.close(fig)
+
+    def test_corrcoef_sparse_image_aggregated(self):
+        sparse_matrix = scipy.sparse.coo_matrix(
+            ([0.2, -0.9, 0.5], ([0, 1, 5000], [1, 0, 5000])),
+            shape=(10000, 10000))
+        fig, axes = plt.subplots(1, 1)
+        plot_corrcoef(sparse_matrix, axes, sparse_rendering='image')
+        image = axes.images[0].get_array()
+        self.assertLess(image.size, 10000 ** 2)
+        # entries sharing a pixel keep the one of largest magnitude
+        self.assertEqual(image[0, 0], -0.9)
+        self.assertEqual(np.count_nonzero(image), 2)
+        plt.close(fig)
+
+    def test_corrcoef_sparse_markers(self):
+        sparse_matrix = scipy.sparse.random(1000, 1000, density=1e-4,
+                                            random_state=0)
+        fig, axes = plt.subplots(1, 1)
+        plot_corrcoef(sparse_matrix, axes)
+        self.assertEqual(len(axes.images), 0)
+        self.assertEqual(len(axes.collections[0].get_offsets()),
+                         sparse_matrix.nnz)
+        plt.close(fig)
+
+
+class CrossCorrelogramGridTestCase(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.binned = np.random.poisson(0.05, size=(7, 3000))
+
+    def test_cross_correlograms(self):
+        max_lag = 10
+        cch = _cross_correlograms(self.binned, max_lag, chunk_size=3)
+        self.assertEqual(cch.shape, (7, 7, 2 * max_lag + 1))
+        zero_lag = self.binned.shape[1] - 1
+        for i, j in [(0, 0), (1, 4), (6, 2)]:
+            target = np.correlate(self.binned[j], self.binned[i], 'full')
+            np.testing.assert_array_equal(
+                cch[i, j], target[zero_lag - max_lag:zero_lag + max_lag + 1])
+
+    def test_cross_correlograms_process_pool(self):
+        cch = _cross_correlograms(self.binned, 5)
+        cch_pool = _cross_correlograms(self.binned, 5, n_jobs=2,
+                                       chunk_size=2)
+        np.testing.assert_array_equal(cch_pool, cch)
+
+    def test_plot_cross_correlogram_grid(self):
+        np.random.seed(1)
+        spiketrains = [homogeneous_poisson_process(20 * pq.Hz,
+                                                   t_stop=10 * pq.s)
+                       for _ in range(5)]
+        fig, axes = plt.subplots(1, 1)
+        cch = plot_cross_correlogram_grid(spiketrains, bin_size=1 * pq.ms,
+                                          max_lag=20, axes=axes)
+        self.assertEqual(cch.shape, (5, 5, 41))
+        np.testing.assert_array_equal(cch[1, 3], cch[3, 1, ::-1])
+        # correlograms and grid lines
+        self.assertEqual(len(axes.collections), 2)
+        self.assertEqual(len(axes.collections[0].get_segments()), 25)
+        plt.close(fig)
+
+
+class CorrcoefSignificanceTestCase(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.spiketrains = [homogeneous_poisson_process(10 * pq.Hz,
+                                                        t_stop=10 * pq.s)
+                            for _ in range(4)]
+        # the first two spike trains share a common input
+        common = homogeneous_poisson_process(5 * pq.Hz, t_stop=10 * pq.s)
+        for k in (0, 1):
+            self.spiketrains[k] = neo.SpikeTrain(
+                np.sort(np.r_[self.spiketrains[k].magnitude,
+                              common.magnitude]) * pq.s, t_stop=10 * pq.s)
+
+    def test_corrcoef_significance_mask(self):
+        mask = corrcoef_significance_mask(self.spiketrains, 5 * pq.ms,
+                                          n_surrogates=20)
+        self.assertEqual(mask.shape, (4, 4))
+        np.testing.assert_array_equal(mask, mask.T)
+        self.assertTrue(np.all(np.diag(mask)))
+        self.assertTrue(mask[0, 1])
+        self.assertFalse(mask[2, 3])
+
+    def test_corrcoef_significance_mask_process_pool(self):
+        np.random.seed(3)
+        mask = corrcoef_significance_mask(self.spiketrains, 5 * pq.ms,
+                                          n_surrogates=12, chunk_size=5)
+        np.random.seed(3)
+        mask_pool = corrcoef_significance_mask(
+            self.spiketrains, 5 * pq.ms, n_surrogates=12, chunk_size=5,
+            n_jobs=2)
+        np.testing.assert_array_equal(mask_pool, mask)
+
+    def test_too_few_surrogates(self):
+        # the smallest p-value is 1 / (n_surrogates + 1) > 0.05
+        mask = corrcoef_significance_mask(self.spiketrains, 5 * pq.ms,
+                                          n_surrogates=10)
+        np.testing.assert_array_equal(mask, np.eye(4, dtype=bool))
+
+    def test_global_random_state_restored(self):
+        # only the seeds of the two chunks are drawn from the global state
+        np.random.seed(7)
+        np.random.randint(2 ** 31, size=2)
+        expected = np.random.rand()
+        np.random.seed(7)
+        corrcoef_significance_mask(self.spiketrains, 5 * pq.ms,
+                                   n_surrogates=4, chunk_size=2)
+        self.assertEqual(np.random.rand(), expected)
+
+    def test_plot_corrcoef_significance_mask(self):
+        matrix = np.eye(3)
+        mask = np.eye(3, dtype=bool)
+        fig, axes = plt.subplots(1, 1)
+        plot_corrcoef(matrix, axes, significance_mask=mask)
+        self.assertEqual(len(axes.images), 2)
+        np.testing.assert_array_equal(axes.images[1].get_array().mask, mask)
+        fig, axes = plt.subplots(1, 1)
+        plot_corrcoef(matrix, axes, significance_mask=mask,
+                      mask_style='hatch')
+        self.assertEqual(len(axes.images), 1)
+        self.assertEqual(len(axes.collections), 1)
+        self.assertRaises(ValueError, plot_corrcoef, matrix, axes,
+                          significance_mask=mask, mask_style='dots')
+        plt.close('all')
+
+    def test_hatch_matches_mask(self):
+        mask = np.random.RandomState(0).rand(20, 30) > 0.5
+        fig, axes = plt.subplots(1, 1)
+        plot_corrcoef(np.zeros(mask.shape), axes, significance_mask=mask,
+                      mask_style='hatch')
+        path = axes.collections[0].get_paths()[0]
+        rows, columns = np.indices(mask.shape)
+        centres = np.column_stack([columns.ravel(), rows.ravel()])
+        hatched = path.contains_points(centres).reshape(mask.shape)
+        np.testing.assert_array_equal(hatched, ~mask)
+        # one rectangle of five vertices per run, with an area of one per
+        # non-significant cell
+        corners = path.vertices.reshape(-1, 5, 2)
+        widths = corners[:, 1, 0] - corners[:, 0, 0]
+        heights = corners[:, 2, 1] - corners[:, 1, 1]
+        self.assertEqual(np.sum(widths * heights), np.count_nonzero(~mask))
+        plt.close(fig)
+
+
+class CorrcoefOrderingTestCase(unittest.TestCase):
+    def setUp(self):
+        # four groups of neurons driven by a shared signal, shuffled
+        random_state = np.random.RandomState(0)
+        self.labels = random_state.randint(4, size=120)
+        signals = random_state.randn(120, 200) + \
+            2 * random_state.randn(4, 200)[self.labels]
+        self.matrix = np.corrcoef(signals)
+
+    def assert_grouped(self, ordering, labels):
+        sorted_labels = labels[ordering.permutation]
+        self.assertEqual(sorted(ordering.permutation), list(range(120)))
+        # every group is contiguous
+        self.assertEqual(np.count_nonzero(np.diff(sorted_labels)), 3)
+
+    def test_corrcoef_ordering(self):
+        for method in ('spectral', 'subsample'):
+            ordering = corrcoef_ordering(self.matrix, method=method,
+                                         n_clusters=4, n_subsample=50,
+                                         seed=1)
+            self.assert_grouped(ordering, self.labels)
+            self.assertEqual(len(ordering.boundaries), 3)
+
+    def test_corrcoef_ordering_sparse(self):
+        sparse_matrix = scipy.sparse.csr_matrix(
+            np.where(np.abs(self.matrix) > 0.3, self.matrix, 0))
+        for method in ('spectral', 'subsample'):
+            ordering = corrcoef_ordering(sparse_matrix, method=method,
+                                         n_clusters=4, seed=1)
+            self.assert_grouped(ordering, self.labels)
+
+    def test_plot_corrcoef_reorder(self):
+        fig, axes = plt.subplots(1, 1)
+        self.assertIsNone(plot_corrcoef(self.matrix, axes))
+        ordering = plot_corrcoef(self.matrix, axes, reorder='spectral')
+        self.assertIsInstance(ordering, CorrcoefOrdering)
+        # the ordering is reused as is
+        self.assertIs(plot_corrcoef(self.matrix, axes, reorder=ordering),
+                      ordering)
+        permuted = self.matrix[np.ix_(ordering.permutation,
+                                      ordering.permutation)]
+        np.testing.assert_array_equal(axes.images[-1].get_array(), permuted)
+        # cluster boundaries
+        self.assertEqual(len(axes.collections), 4)
+        self.assertRaises(ValueError, plot_corrcoef, self.matrix, axes,
+                          reorder='dendrogram')
+        self.assertRaises(ValueError, plot_corrcoef, self.matrix[:10, :10],
+                          axes, reorder=ordering)
+        plt.close(fig)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,3 +1,4 @@
+import io
 import tempfile
 import unittest
 from pathlib import Path
@@ -11,7 +12,17 @@ import quantities as pq
 import elephant.unitary_event_analysis as ue
 from viziphant.tests.utils.utils import TEST_DATA_DIR, TARGET_IMAGES_DIR
 from viziphant.tests.utils.utils import images_difference, check_integrity
-from viziphant.unitary_event_analysis import plot_unitary_events
+from viziphant.tests.utils.utils import generate_spiketrains
+from viziphant.unitary_event_analysis import plot_unitary_events, \
+    PSTHPyramid, UnitaryEventsTemplate, stack_joint_surprise, \
+    plot_unitary_events_summary, CoincidenceIndices, _decimate_line, \
+    _plot_decimated
+
+try:
+    import h5py  # noqa: F401
+    HAVE_H5PY = True
+except ImportError:
+    HAVE_H5PY = False
 
 UE_DATASET_URL = "https://web.gin.g-node.org/INM-6/elephant-data/raw/master/" \
                  "dataset-1/dataset-1.h5"
@@ -57,5 +68,398 @@ class UETestCase(unittest.TestCase):
         self.assertLessEqual(diff_norm, tolerance)
 
 
+class PSTHPyramidTestCase(unittest.TestCase):
+    def setUp(self):
+        self.spiketrains = generate_spiketrains()
+
+    def test_counts_match_histogram(self):
+        pyramid = PSTHPyramid(self.spiketrains, binsize=5 * pq.ms)
+        counts = pyramid.counts(1)
+        self.assertEqual(counts.shape, (2, 200))
+        for n in range(2):
+            spikes = np.hstack([trial[n].magnitude
+                                for trial in self.spiketrains])
+            target, _ = np.histogram(spikes, bins=200, range=(0, 1000))
+            np.testing.assert_array_equal(counts[n], target)
+
+    def test_coarse_levels(self):
+        pyramid = PSTHPyramid(self.spiketrains, binsize=5 * pq.ms)
+        finest = pyramid.counts(1)
+        for factor in (2, 3, 8, 12):
+            n_bins = finest.shape[1] // factor
+            target = finest[:, :n_bins * factor].reshape(
+                2, n_bins, factor).sum(axis=2)
+            np.testing.assert_array_equal(pyramid.counts(factor), target)
+
+    def test_rate(self):
+        pyramid = PSTHPyramid(self.spiketrains, binsize=5 * pq.ms)
+        bin_centers, rates = pyramid.rate(0.1 * pq.s)
+        self.assertEqual(rates.shape, (10, 2))
+        np.testing.assert_array_almost_equal(
+            bin_centers.rescale('ms').magnitude, np.arange(50, 1000, 100))
+        # 50 spikes per trial and neuron spread over 1 s
+        self.assertAlmostEqual(rates.rescale('Hz').magnitude.mean(), 50.)
+
+
+class DecimationTestCase(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.x = np.arange(100000, dtype=float)
+        self.y = np.cumsum(np.random.randn(len(self.x)))
+        self.y[54321] = 1000.
+
+    def test_short_line_unchanged(self):
+        x, y = _decimate_line(self.x[:400], self.y[:400], (0, 400), 100)
+        np.testing.assert_array_equal(x, self.x[:400])
+        np.testing.assert_array_equal(y, self.y[:400])
+
+    def test_extrema_per_column(self):
+        n_columns = 50
+        x, y = _decimate_line(self.x, self.y, (0, len(self.x)), n_columns)
+        self.assertLessEqual(len(x), 4 * n_columns)
+        self.assertEqual(x[0], self.x[0])
+        self.assertEqual(x[-1], self.x[-1])
+        for column in np.split(self.y, n_columns):
+            self.assertIn(column.max(), y)
+            self.assertIn(column.min(), y)
+        self.assertEqual(y.max(), 1000.)
+
+    def test_zoom_of_shared_axes_decimates_visible_part(self):
+        fig, (axes_top, axes) = plt.subplots(2, 1, sharex=True,
+                                             figsize=(2, 2), dpi=100)
+        axes.set_xlim(0, len(self.x))
+        line = _plot_decimated(axes, self.x, self.y, color='r')
+        self.assertEqual(line.get_color(), 'r')
+        self.assertLess(len(line.get_xdata()), 1000)
+        self.assertEqual(axes.dataLim.intervaly[1], self.y.max())
+        # the decimation follows zooms of any panel sharing the time axis
+        axes_top.set_xlim(54300, 54400)
+        fig.canvas.draw()
+        np.testing.assert_array_equal(line.get_xdata(),
+                                      self.x[54299:54402])
+        plt.close(fig)
+
+    def test_decimation_at_saved_dpi(self):
+        fig, axes = plt.subplots(figsize=(2, 1), dpi=50)
+        axes.set_xlim(0, len(self.x))
+        line = _plot_decimated(axes, self.x, self.y)
+        n_points = {}
+        for dpi in (50, 200):
+            # record the decimated data while the figure is being drawn
+            draw = line.draw
+
+            def record_draw(renderer):
+                draw(renderer)
+                n_points[dpi] = len(line.get_xdata())
+
+            line.draw = record_draw
+            fig.savefig(io.BytesIO(), dpi=dpi)
+            line.draw = draw
+        self.assertGreater(n_points[200], 2 * n_points[50])
+        plt.close(fig)
+
+
+class CoincidenceIndicesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.indices = {'trial0': np.array([7., 3., 3., 7., 9.]),
+                        'trial1': np.array([]),
+                        'trial2': np.array([4., 1., 4.])}
+        self.csr = CoincidenceIndices.from_dict(self.indices)
+
+    def test_from_dict(self):
+        self.assertEqual(len(self.csr), 3)
+        np.testing.assert_array_equal(self.csr.bin_indices, [3, 7, 9, 1, 4])
+        np.testing.assert_array_equal(self.csr.offsets, [0, 3, 3, 5])
+        self.assertTrue(np.shares_memory(self.csr[2], self.csr.bin_indices))
+        np.testing.assert_array_equal(self.csr[-1], [1, 4])
+        self.assertRaises(IndexError, self.csr.__getitem__, 3)
+        trials = CoincidenceIndices.from_dict(self.indices, n_trials=4)
+        self.assertEqual(len(trials[3]), 0)
+
+    def test_to_dict(self):
+        indices = self.csr.to_dict()
+        self.assertEqual(list(indices), ['trial0', 'trial1', 'trial2'])
+        for key, trial_bins in indices.items():
+            np.testing.assert_array_equal(trial_bins,
+                                          np.unique(self.indices[key]))
+
+    def test_invalid_offsets(self):
+        self.assertRaises(ValueError, CoincidenceIndices, np.arange(4),
+                          [0, 2, 3])
+
+    def _assert_save_load(self, filename):
+        self.csr.save(filename)
+        for mmap_mode in (None, 'r'):
+            loaded = CoincidenceIndices.load(filename, mmap_mode=mmap_mode)
+            self.assertEqual(isinstance(loaded.bin_indices, np.memmap),
+                             mmap_mode is not None)
+            np.testing.assert_array_equal(loaded.bin_indices,
+                                          self.csr.bin_indices)
+            np.testing.assert_array_equal(loaded.offsets, self.csr.offsets)
+            del loaded
+
+    def test_save_load_npz(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self._assert_save_load(Path(tmpdir) / 'indices.npz')
+
+    @unittest.skipUnless(HAVE_H5PY, "requires h5py")
+    def test_save_load_hdf5(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self._assert_save_load(Path(tmpdir) / 'indices.h5')
+
+
+class UEMultiPatternTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.spiketrains = generate_spiketrains(n_trials=10, n_spikes=100)
+        results = [ue.jointJ_window_analysis(
+            cls.spiketrains, 5 * pq.ms, winsize=100 * pq.ms,
+            winstep=10 * pq.ms, pattern_hash=[pattern_hash])
+            for pattern_hash in (3, 1)]
+        cls.UE = {key: np.vstack([result[key] for result in results])
+                  for key in ('Js', 'n_emp', 'n_exp')}
+        cls.UE['rate_avg'] = results[0]['rate_avg']
+        cls.UE['indices'] = [result['indices'] for result in results]
+        cls.UE_single = results[0]
+
+    def _plot(self, joint_surprise_dict, **plot_params_user):
+        return plot_unitary_events(
+            self.spiketrains, joint_surprise_dict, significance_level=0.05,
+            binsize=5 * pq.ms, window_size=100 * pq.ms,
+            window_step=10 * pq.ms, **plot_params_user)
+
+    def test_overlay(self):
+        result = self._plot(self.UE, pattern_hash=[3, 1])
+        self.assertEqual(len(result.statistical_significance.lines), 2 + 2)
+        self.assertEqual(len(result.coincidence_rates.lines), 2 * 2)
+        # one raster artist and one UE artist per pattern
+        self.assertEqual(len(result.unitary_events.lines), 1 + 1 + 2)
+        plt.close('all')
+
+    def test_facet(self):
+        result = self._plot(self.UE, pattern_hash=[3, 1],
+                            pattern_layout='facet')
+        self.assertEqual(len(result.statistical_significance), 2)
+        self.assertEqual(len(result.coincidence_rates), 2)
+        for pattern, axes in enumerate(result.statistical_significance):
+            np.testing.assert_array_equal(axes.lines[0].get_ydata(),
+                                          self.UE['Js'][pattern])
+        plt.close('all')
+
+    def test_single_pattern_matches_first_pattern(self):
+        single = self._plot(self.UE_single)
+        single_markers = single.unitary_events.lines[-1].get_xydata()
+        multi = self._plot(self.UE)
+        multi_markers = multi.unitary_events.lines[2].get_xydata()
+        np.testing.assert_array_equal(single_markers, multi_markers)
+        plt.close('all')
+
+    def test_coincidence_indices(self):
+        markers = self._plot(self.UE_single).unitary_events.lines[-1]
+        UE_csr = dict(self.UE_single)
+        UE_csr['indices'] = CoincidenceIndices.from_dict(
+            self.UE_single['indices'])
+        markers_csr = self._plot(UE_csr).unitary_events.lines[-1]
+        np.testing.assert_array_equal(markers_csr.get_xydata(),
+                                      markers.get_xydata())
+        UE_csr['indices'] = CoincidenceIndices.from_dict(
+            self.UE_single['indices'], n_trials=5)
+        self.assertRaises(ValueError, self._plot, UE_csr)
+        plt.close('all')
+
+    def test_psth_rebins_on_zoom_of_any_panel(self):
+        result = self._plot(self.UE_single, psth_binsize=20 * pq.ms)
+        rate_line = result.spike_rates.lines[0]
+        self.assertEqual(np.diff(rate_line.get_xdata()[:2])[0], 20.)
+        result.spike_events.set_xlim(200, 400)
+        self.assertEqual(np.diff(rate_line.get_xdata()[:2])[0], 5.)
+        plt.close('all')
+
+    def test_psth_binsize_smaller_than_binsize(self):
+        self.assertRaises(ValueError, self._plot, self.UE_single,
+                          psth_binsize=1 * pq.ms)
+
+    def test_invalid_pattern_hash(self):
+        self.assertRaises(ValueError, self._plot, self.UE,
+                          pattern_hash=[3])
+
+
+class UnitaryEventsTemplateTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.spiketrains = [generate_spiketrains(n_trials=10, n_spikes=100,
+                                                seed=seed)
+                           for seed in range(2)]
+        cls.UE = [ue.jointJ_window_analysis(
+            spiketrains, 5 * pq.ms, winsize=100 * pq.ms, winstep=10 * pq.ms,
+            pattern_hash=[3]) for spiketrains in cls.spiketrains]
+
+    def setUp(self):
+        self.template = UnitaryEventsTemplate(
+            n_trials=10, n_neurons=2, t_start=0 * pq.ms, t_stop=1000 * pq.ms,
+            significance_level=0.05, binsize=5 * pq.ms,
+            window_size=100 * pq.ms, window_step=10 * pq.ms,
+            events={'Vision': [500] * pq.ms})
+
+    def test_cached_rendering_matches_full_rendering(self):
+        for spiketrains, UE in zip(self.spiketrains, self.UE):
+            self.template.update(spiketrains, UE, unit_real_ids=[5, 8])
+            with io.BytesIO() as cached, io.BytesIO() as full:
+                self.template.savefig(cached)
+                self.template.savefig(full, format='png')
+                cached.seek(0)
+                full.seek(0)
+                self.assertLessEqual(images_difference(full, cached), 1e-3)
+
+    def test_update_swaps_data(self):
+        self.template.update(self.spiketrains[0], self.UE[0])
+        background = self.template.render()[:].copy()
+        self.template.update(self.spiketrains[1], self.UE[1],
+                             unit_real_ids=[5, 8])
+        np.testing.assert_array_equal(
+            self.template.axes.statistical_significance.lines[0].get_ydata(),
+            self.UE[1]['Js'])
+        unit_texts = self.template.axes.spike_events.texts[:2]
+        self.assertEqual([text.get_text() for text in unit_texts],
+                         ['Unit 8', 'Unit 5'])
+        self.assertFalse(np.array_equal(self.template.render(), background))
+        # only the data artists were added to the axes
+        self.assertEqual(len(self.template.axes.unitary_events.lines), 4)
+
+    def test_geometry_mismatch(self):
+        self.assertRaises(ValueError, self.template.update,
+                          self.spiketrains[0][:5], self.UE[0])
+
+    def test_layout_matches_plot(self):
+        self.template.update(self.spiketrains[0], self.UE[0])
+        result = plot_unitary_events(
+            self.spiketrains[0], self.UE[0], significance_level=0.05,
+            binsize=5 * pq.ms, window_size=100 * pq.ms,
+            window_step=10 * pq.ms, events={'Vision': [500] * pq.ms})
+        for template_axes, axes in zip(self.template.axes, result):
+            self.assertEqual(template_axes.get_ylim(), axes.get_ylim())
+            np.testing.assert_array_equal(template_axes.get_yticks(),
+                                          axes.get_yticks())
+            self.assertEqual(len(template_axes.get_children()),
+                             len(axes.get_children()))
+        plt.close('all')
+
+    def test_psth_rebins_on_zoom(self):
+        template = UnitaryEventsTemplate(
+            n_trials=10, n_neurons=2, t_start=0 * pq.ms, t_stop=1000 * pq.ms,
+            significance_level=0.05, binsize=5 * pq.ms,
+            window_size=100 * pq.ms, window_step=10 * pq.ms,
+            psth_binsize=20 * pq.ms)
+        template.update(self.spiketrains[0], self.UE[0])
+        rate_line = template.axes.spike_rates.lines[0]
+        self.assertEqual(np.diff(rate_line.get_xdata()[:2])[0], 20.)
+        template.axes.unitary_events.set_xlim(200, 400)
+        self.assertEqual(np.diff(rate_line.get_xdata()[:2])[0], 5.)
+
+
+class UnitaryEventsSummaryTestCase(unittest.TestCase):
+    def setUp(self):
+        # 91 windows of 100 ms every 10 ms within 1 s
+        np.random.seed(0)
+        self.joint_surprise = np.random.randn(300, 91).astype(np.float32)
+        self.joint_surprise[120, 40] = 10.
+        self.geometry = (0 * pq.ms, 1000 * pq.ms, 100 * pq.ms, 10 * pq.ms)
+
+    def test_stack_joint_surprise(self):
+        joint_surprise_dicts = [{'Js': pair_surprise.astype(np.float64)}
+                                for pair_surprise in self.joint_surprise]
+        stacked = stack_joint_surprise(joint_surprise_dicts)
+        self.assertEqual(stacked.dtype, np.float32)
+        np.testing.assert_array_equal(stacked, self.joint_surprise)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = Path(tmpdir) / 'joint_surprise.npy'
+            stack_joint_surprise(iter(self.joint_surprise),
+                                 filename=filename, n_pairs=300)
+            np.testing.assert_array_equal(np.load(filename, mmap_mode='r'),
+                                          self.joint_surprise)
+        self.assertRaises(ValueError, stack_joint_surprise,
+                          [np.zeros(91), np.zeros(90)])
+
+    def test_downsampled_maximum(self):
+        fig, axes = plt.subplots(figsize=(2, 2), dpi=50)
+        image = plot_unitary_events_summary(self.joint_surprise,
+                                            *self.geometry, axes)
+        image_data = image.get_array()
+        self.assertLess(image_data.shape[0], 300)
+        self.assertEqual(image_data.max(), 10.)
+        self.assertEqual(np.nanmax(image_data),
+                         self.joint_surprise.max())
+        # zooming into a few pairs and windows shows them unpooled
+        axes.set_ylim(124.5, 119.5)
+        axes.set_xlim(440, 490)
+        fig.canvas.draw()
+        np.testing.assert_array_equal(image.get_array(),
+                                      self.joint_surprise[120:125, 39:45])
+        plt.close(fig)
+
+    def test_coarse_level(self):
+        # more pairs than SUMMARY_COARSE_SIZE are pooled in blocks of three
+        joint_surprise = np.tile(self.joint_surprise, (14, 1))
+        joint_surprise[4000, 80] = 20.
+        for quantity in ('surprise', 'significant'):
+            fig, axes = plt.subplots(figsize=(2, 2), dpi=50)
+            image = plot_unitary_events_summary(
+                joint_surprise, *self.geometry, axes, quantity=quantity)
+            fig.canvas.draw()
+            image_data = image.get_array()
+            self.assertLess(image_data.shape[0], 100)
+            if quantity == 'surprise':
+                self.assertEqual(image_data.max(), 20.)
+            else:
+                self.assertEqual(image_data.sum(), np.count_nonzero(
+                    joint_surprise >= ue.jointJ(0.05)))
+            axes.set_ylim(4001.5, 3998.5)
+            axes.set_xlim(800, 850)
+            fig.canvas.draw()
+            if quantity == 'surprise':
+                np.testing.assert_array_equal(
+                    image.get_array(), joint_surprise[3999:4002, 75:81])
+            plt.close(fig)
+
+    def test_pan_off_data(self):
+        fig, axes = plt.subplots(figsize=(2, 2), dpi=50)
+        image = plot_unitary_events_summary(self.joint_surprise,
+                                            *self.geometry, axes)
+        # past the last window and pair, then before the first ones
+        axes.set_xlim(2000, 2100)
+        axes.set_ylim(400, 350)
+        fig.canvas.draw()
+        np.testing.assert_array_equal(image.get_array(),
+                                      self.joint_surprise[-1:, -1:])
+        axes.set_xlim(-500, -400)
+        axes.set_ylim(-50, -100)
+        fig.canvas.draw()
+        np.testing.assert_array_equal(image.get_array(),
+                                      self.joint_surprise[:1, :1])
+        plt.close(fig)
+
+    def test_significant_counts(self):
+        fig, axes = plt.subplots(figsize=(2, 2), dpi=50)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = Path(tmpdir) / 'joint_surprise.npy'
+            np.save(filename, self.joint_surprise)
+            image = plot_unitary_events_summary(
+                filename, *self.geometry, axes, quantity='significant')
+            n_significant = np.count_nonzero(
+                self.joint_surprise >= ue.jointJ(0.05))
+            self.assertEqual(image.get_array().sum(), n_significant)
+            del image
+        plt.close(fig)
+
+    def test_invalid_input(self):
+        fig, axes = plt.subplots()
+        self.assertRaises(ValueError, plot_unitary_events_summary,
+                          self.joint_surprise, *self.geometry, axes,
+                          quantity='mean')
+        self.assertRaises(ValueError, plot_unitary_events_summary,
+                          self.joint_surprise[:, :50], *self.geometry, axes)
+        plt.close(fig)
+
+
 if __name__ == '__main__':
     unittest.main()
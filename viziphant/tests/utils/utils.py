@@ -4,6 +4,7 @@ import os
 from pathlib import Path
 
 import matplotlib.image as mpimg
+import neo
 import numpy as np
 
 TESTS_DIR = Path(__file__).parent.parent
@@ -56,3 +57,16 @@ def images_difference(path_target_image, path_result_image):
     diff_norm = np.linalg.norm(diff_image.flatten(), ord=1)
     diff_norm = diff_norm / diff_image.size  # per pixel per channel
     return diff_norm
+
+
+def generate_spiketrains(n_trials=5, n_neurons=2, n_spikes=50, seed=0):
+    """
+    Generates a nested list of trials and neurons of uniformly distributed
+    spike trains on [0, 1000) ms.
+    """
+    np.random.seed(seed)
+    return [[neo.SpikeTrain(np.sort(np.random.uniform(0, 1000,
+                                                      size=n_spikes)),
+                            t_start=0, t_stop=1000, units='ms')
+             for neuron in range(n_neurons)]
+            for trial in range(n_trials)]
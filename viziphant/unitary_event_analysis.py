@@ -2,12 +2,18 @@
 Plotting function for unitary event analysis results.
 """
 import math
+import os
 import string
+import zipfile
 from collections import namedtuple
 
+import matplotlib.image as mpimg
 import matplotlib.pyplot as plt
 import numpy as np
 import quantities as pq
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
 from matplotlib.ticker import (MaxNLocator)
 
 import elephant.unitary_event_analysis as ue
@@ -46,8 +52,1015 @@ params_dict_default = {
     'time_unit': 'ms',
     # uniform frequency unit
     'frequency_unit': 'Hz',
+    # bin width of the spike-based PSTH in the spike rates panel
+    'psth_binsize': None,
+    # hash values of the patterns, used as labels
+    'pattern_hash': None,
+    # 'overlay' or 'facet' the coincidence rates and significance of patterns
+    'pattern_layout': 'overlay',
 }
 
+# lines of the rates and significance panels with more points than this per
+# pixel column of their axes are decimated, see _decimate_line
+DECIMATION_POINTS_PER_PIXEL = 4
+
+
+class PSTHPyramid(object):
+    """
+    Peri-stimulus time histogram of all trials, computed directly from the
+    spike times and cached at multiple resolutions.
+
+    The spike counts at the finest resolution are obtained with a single
+    `np.bincount` over the flattened spikes of all trials and neurons. Coarser
+    resolutions are built on demand by summing adjacent bins of an already
+    cached level, so changing the bin width never rescans the spikes.
+
+    Parameters
+    ----------
+    data : list of list of neo.SpikeTrain
+        A nested list of trials, neurons and their neo.SpikeTrain objects,
+        respectively.
+    binsize : quantities.Quantity
+        The finest bin width of the histogram.
+
+    Attributes
+    ----------
+    t_start, t_stop : quantities.Quantity
+        The time limits of the histogram, taken from the first spike train.
+    binsize : quantities.Quantity
+        The finest bin width, in the time unit of the spike trains.
+    n_trials, n_neurons : int
+        The number of trials and neurons in `data`.
+    """
+
+    def __init__(self, data, binsize):
+        self.n_trials = len(data)
+        self.n_neurons = len(data[0])
+        self.t_start = data[0][0].t_start
+        self.t_stop = data[0][0].t_stop
+        time_unit = self.t_start.units
+        self.binsize = binsize.rescale(time_unit)
+        binsize_dl = self.binsize.magnitude.item()
+        t_start_dl = self.t_start.magnitude.item()
+        n_bins = int((self.t_stop - self.t_start).magnitude.item()
+                     // binsize_dl)
+
+        # flatten the spikes of all trials into one array of bin ids, shifted
+        # by the neuron id so that a single bincount covers all neurons
+        bin_ids = []
+        for data_trial in data:
+            for n, spiketrain in enumerate(data_trial):
+                spike_bins = np.floor(
+                    (spiketrain.rescale(time_unit).magnitude - t_start_dl)
+                    / binsize_dl).astype(np.int64)
+                spike_bins = spike_bins[(spike_bins >= 0) &
+                                        (spike_bins < n_bins)]
+                bin_ids.append(spike_bins + n * n_bins)
+        bin_ids = np.concatenate(bin_ids) if bin_ids else np.empty(
+            0, dtype=np.int64)
+        counts = np.bincount(bin_ids, minlength=self.n_neurons * n_bins)
+        self._levels = {1: counts.reshape(self.n_neurons, n_bins)}
+
+    def counts(self, factor):
+        """
+        Spike counts summed over trials, with `factor` finest bins merged
+        into one. Incomplete bins at the end are dropped.
+
+        Parameters
+        ----------
+        factor : int
+            The number of finest bins per output bin.
+
+        Returns
+        -------
+        np.ndarray
+            The spike counts of shape (n_neurons, n_bins // factor).
+        """
+        factor = max(int(factor), 1)
+        if factor in self._levels:
+            return self._levels[factor]
+        # aggregate from the coarsest power of two that divides the factor
+        base = factor & -factor
+        if base == factor:
+            base = factor // 2
+        source = self.counts(base)
+        merge = factor // base
+        n_bins = source.shape[1] // merge
+        level = source[:, :n_bins * merge].reshape(
+            self.n_neurons, n_bins, merge).sum(axis=2)
+        self._levels[factor] = level
+        return level
+
+    def rate(self, binsize):
+        """
+        Trial-averaged firing rate at the requested bin width.
+
+        Parameters
+        ----------
+        binsize : quantities.Quantity
+            The bin width. It is rounded to a multiple of the finest bin
+            width of the pyramid.
+
+        Returns
+        -------
+        bin_centers : quantities.Quantity
+            The centers of the histogram bins.
+        rates : quantities.Quantity
+            The firing rates of shape (n_bins, n_neurons).
+        """
+        factor = max(int(round(
+            (binsize / self.binsize).simplified.magnitude.item())), 1)
+        counts = self.counts(factor)
+        width = self.binsize * factor
+        bin_centers = self.t_start + (np.arange(counts.shape[1]) + 0.5) * \
+            width
+        rates = counts.T / (self.n_trials * width)
+        return bin_centers, rates
+
+
+class CoincidenceIndices(object):
+    """
+    Compact layout of the coincidence bin indices of all trials, as an
+    alternative to the 'trial<N>' dictionary 'indices' of
+    `elephant.unitary_event_analysis.jointJ_window_analysis`.
+
+    The sorted unique bin indices of all trials are concatenated into a
+    single integer array, and `offsets[trial]:offsets[trial + 1]` delimits
+    the indices of each trial, as in a CSR matrix. Indexing with a trial
+    returns a view, so duplicates are removed only once, at conversion.
+
+    Parameters
+    ----------
+    bin_indices : np.ndarray of int
+        The concatenated bin indices, sorted and unique within each trial.
+    offsets : np.ndarray of int
+        The start of each trial in `bin_indices`, followed by the length of
+        `bin_indices`.
+
+    Examples
+    --------
+    >>> UE = ue.jointJ_window_analysis(data, 5 * pq.ms, 100 * pq.ms,
+    ...                                10 * pq.ms, pattern_hash=[3])
+    >>> indices = CoincidenceIndices.from_dict(UE['indices'])
+    >>> indices.save('indices.npz')
+    >>> UE['indices'] = CoincidenceIndices.load('indices.npz',
+    ...                                         mmap_mode='r')
+    >>> plot_unitary_events(data, UE, 0.05, 5 * pq.ms, 100 * pq.ms,
+    ...                     10 * pq.ms)
+    """
+
+    def __init__(self, bin_indices, offsets):
+        self.bin_indices = bin_indices
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        if len(self.offsets) == 0 or self.offsets[-1] != len(bin_indices):
+            raise ValueError("The last offset should be the number of bin "
+                             "indices")
+
+    @classmethod
+    def from_dict(cls, indices, n_trials=None):
+        """
+        Converts the 'trial<N>' dictionary of `jointJ_window_analysis`,
+        removing duplicate bin indices.
+
+        Parameters
+        ----------
+        indices : dict
+            The bin indices of the coincidences in each trial, with keys
+            'trial0', 'trial1', ...
+        n_trials : int or None
+            The number of trials. If None, it is derived from the largest
+            trial key. Missing trials have no coincidences.
+            Default: None
+
+        Returns
+        -------
+        CoincidenceIndices
+        """
+        if n_trials is None:
+            n_trials = max((int(key[len('trial'):]) + 1 for key in indices),
+                           default=0)
+        trials = [np.unique(np.asarray(indices.get('trial' + str(trial), []),
+                                       dtype=np.int64))
+                  for trial in range(n_trials)]
+        offsets = np.cumsum([0] + [len(trial_bins) for trial_bins in trials])
+        bin_indices = np.concatenate(trials) if trials else np.empty(
+            0, dtype=np.int64)
+        return cls(bin_indices, offsets)
+
+    def to_dict(self):
+        """
+        Converts to the 'trial<N>' dictionary of `jointJ_window_analysis`.
+
+        Returns
+        -------
+        dict
+            The bin indices of each trial, as views of `bin_indices`.
+        """
+        return {'trial' + str(trial): self[trial]
+                for trial in range(len(self))}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, trial):
+        if not -len(self) <= trial < len(self):
+            raise IndexError(f"trial {trial} is out of range for "
+                             f"{len(self)} trials")
+        trial %= len(self)
+        return self.bin_indices[self.offsets[trial]:self.offsets[trial + 1]]
+
+    def save(self, filename):
+        """
+        Saves the indices to an uncompressed `.npz` file, or to an HDF5 file
+        if `filename` ends with '.h5' or '.hdf5', which requires 'h5py'.
+        Both can be memory-mapped by :meth:`load`.
+
+        Parameters
+        ----------
+        filename : str or path-like
+            The output file.
+        """
+        if _is_hdf5(filename):
+            h5py = _import_h5py()
+            with h5py.File(filename, 'w') as h5file:
+                h5file.create_dataset('bin_indices',
+                                      data=np.asarray(self.bin_indices))
+                h5file.create_dataset('offsets', data=self.offsets)
+        else:
+            np.savez(filename, bin_indices=self.bin_indices,
+                     offsets=self.offsets)
+
+    @classmethod
+    def load(cls, filename, mmap_mode=None):
+        """
+        Loads indices saved by :meth:`save`.
+
+        Parameters
+        ----------
+        filename : str or path-like
+            The `.npz` or HDF5 file.
+        mmap_mode : {None, 'r', 'r+', 'c'}
+            If given, the bin indices are memory-mapped from the file with
+            this mode instead of being read, see `np.memmap`.
+            Default: None
+
+        Returns
+        -------
+        CoincidenceIndices
+        """
+        if _is_hdf5(filename):
+            h5py = _import_h5py()
+            with h5py.File(filename, 'r') as h5file:
+                dataset = h5file['bin_indices']
+                offsets = h5file['offsets'][()]
+                # only contiguous datasets have an offset in the file
+                data_offset = dataset.id.get_offset()
+                if mmap_mode is None or data_offset is None or \
+                        dataset.size == 0:
+                    return cls(dataset[()], offsets)
+                dtype, shape = dataset.dtype, dataset.shape
+            return cls(np.memmap(filename, dtype=dtype, mode=mmap_mode,
+                                 offset=data_offset, shape=shape), offsets)
+        with np.load(filename) as npz:
+            offsets = npz['offsets']
+            if mmap_mode is None:
+                return cls(npz['bin_indices'], offsets)
+        return cls(_npz_memmap(filename, 'bin_indices', mmap_mode), offsets)
+
+
+def _is_hdf5(filename):
+    return os.fspath(filename).lower().endswith(('.h5', '.hdf5'))
+
+
+def _import_h5py():
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError("HDF5 files of coincidence indices require 'h5py'."
+                          " Install it or use an '.npz' file.")
+    return h5py
+
+
+def _npz_memmap(filename, name, mmap_mode):
+    """
+    Memory-maps the array `name` of an uncompressed `.npz` file, which is
+    stored as an `.npy` file within the zip archive.
+    """
+    with zipfile.ZipFile(filename) as archive:
+        info = archive.getinfo(name + '.npy')
+        if info.compress_type != zipfile.ZIP_STORED:
+            raise ValueError(f"'{name}' is compressed and cannot be "
+                             f"memory-mapped")
+    with open(filename, 'rb') as npz_file:
+        # skip the local file header of the zip member
+        npz_file.seek(info.header_offset + 26)
+        name_length, extra_length = np.frombuffer(npz_file.read(4),
+                                                  dtype='<u2')
+        npz_file.seek(name_length + extra_length, os.SEEK_CUR)
+        version = np.lib.format.read_magic(npz_file)
+        if version == (1, 0):
+            header = np.lib.format.read_array_header_1_0(npz_file)
+        else:
+            header = np.lib.format.read_array_header_2_0(npz_file)
+        shape, fortran_order, dtype = header
+        data_offset = npz_file.tell()
+    return np.memmap(filename, dtype=dtype, mode=mmap_mode,
+                     offset=data_offset, shape=shape,
+                     order='F' if fortran_order else 'C')
+
+
+def _pattern_axis(values, n_windows):
+    """
+    Returns per-window results as a 2D array with the pattern hash on the
+    0-axis and the windows on the 1-axis. Single-pattern results are 1D.
+    """
+    values = np.asarray(values)
+    if values.ndim == 1:
+        return values[np.newaxis, :]
+    if values.shape[1] != n_windows and values.shape[0] == n_windows:
+        return values.T
+    return values
+
+
+def _trial_coincidences(indices, n_trials):
+    """
+    Returns the sorted unique coincidence bin indices of each trial from the
+    'trial<N>' dictionary of `jointJ_window_analysis` or from
+    `CoincidenceIndices`, which are already unique.
+    """
+    if isinstance(indices, CoincidenceIndices):
+        if len(indices) != n_trials:
+            raise ValueError(f"The coincidence indices have {len(indices)} "
+                             f"trials, but the data has {n_trials}")
+        return [indices[trial] for trial in range(n_trials)]
+    return [np.unique(np.asarray(indices['trial' + str(trial)],
+                                 dtype=np.int64))
+            for trial in range(n_trials)]
+
+
+def _raster_coordinates(event_times, n_trials):
+    """
+    Returns the x (time) and y (trial row) coordinates of events given as a
+    nested list of trials and neurons, stacking neurons on top of each other
+    as in the raster panels of `plot_unitary_events`.
+    """
+    n_neurons = len(event_times[0]) if event_times else 0
+    x, y = [], []
+    for n in range(n_neurons):
+        for trial, event_times_trial in enumerate(event_times):
+            x.append(event_times_trial[n])
+            y.append(np.full(len(event_times_trial[n]),
+                             trial + n * (n_trials + 1) + 1, dtype=float))
+    if not x:
+        return np.empty(0), np.empty(0)
+    return np.concatenate(x), np.concatenate(y)
+
+
+def _unitary_event_mask(event_times, t_winpos, window_size, significant):
+    """
+    Returns which events fall into at least one significant analysis window
+    [t_winpos, t_winpos + window_size).
+    """
+    cumulative = np.concatenate(([0], np.cumsum(significant)))
+    n_left_edges_before = np.searchsorted(t_winpos, event_times, side='right')
+    n_windows_ended = np.searchsorted(t_winpos, event_times - window_size,
+                                      side='right')
+    return cumulative[n_left_edges_before] > cumulative[n_windows_ended]
+
+
+def _pattern_colors(n_patterns):
+    """
+    Returns the colors of the pattern-specific artists. A single pattern
+    keeps the classic color scheme, several patterns follow the color cycle.
+    """
+    if n_patterns == 1:
+        return {'coincidences': ['c'], 'empirical': ['c'],
+                'expected': ['m'], 'expected_style': '-',
+                'joint_surprise': ['k'], 'unitary_events': ['r']}
+    color_cycle = plt.rcParams['axes.prop_cycle'].by_key()['color']
+    colors = [color_cycle[pattern % len(color_cycle)]
+              for pattern in range(n_patterns)]
+    return {'coincidences': colors, 'empirical': colors,
+            'expected': colors, 'expected_style': '--',
+            'joint_surprise': colors, 'unitary_events': colors}
+
+
+def _unique_axes(axes_list):
+    """
+    Removes repeated axes while keeping the order.
+    """
+    return list(dict.fromkeys(axes_list))
+
+
+def _decimate_line(x, y, xlim, n_columns):
+    """
+    Reduces a line with sorted x values to the first, last, minimum and
+    maximum point of each of `n_columns` pixel columns within `xlim` (M4
+    decimation). The decimated line covers the same pixels as the full one,
+    so that peaks such as joint surprise excursions past the significance
+    threshold are kept. Points outside `xlim` are dropped, except for the
+    neighbours of the limits. Lines with at most
+    `DECIMATION_POINTS_PER_PIXEL` points per column are returned unchanged.
+    """
+    if len(x) <= DECIMATION_POINTS_PER_PIXEL * n_columns:
+        return x, y
+    left, right = sorted(xlim)
+    first = max(np.searchsorted(x, left, side='left') - 1, 0)
+    last = min(np.searchsorted(x, right, side='right') + 1, len(x))
+    x, y = x[first:last], y[first:last]
+    if len(x) <= DECIMATION_POINTS_PER_PIXEL * n_columns:
+        return x, y
+    columns = np.clip(((x - left) / (right - left) * n_columns).astype(
+        np.int64), 0, n_columns - 1)
+    starts = np.flatnonzero(np.r_[True, columns[1:] != columns[:-1]])
+    ends = np.append(starts[1:], len(x)) - 1
+    column_sizes = ends - starts + 1
+    extrema = []
+    for reduce in (np.fmin, np.fmax):
+        # the first point of each column that equals its extremum
+        is_extremum = y == np.repeat(reduce.reduceat(y, starts),
+                                     column_sizes)
+        extremum_points = np.flatnonzero(is_extremum)
+        _, first = np.unique(columns[extremum_points], return_index=True)
+        extrema.append(extremum_points[first])
+    keep = np.unique(np.concatenate([starts, ends] + extrema))
+    return x[keep], y[keep]
+
+
+def _pixel_width(axes):
+    """
+    Returns the width of the axes in pixel columns at the current dpi of
+    its figure.
+    """
+    return max(int(axes.get_window_extent().width), 1)
+
+
+class _DecimatedLine(Line2D):
+    """
+    Line that keeps its full data and draws it decimated with
+    `_decimate_line`. The decimation is redone at draw time whenever the
+    limits or the pixel width of the axes have changed, so that it follows
+    zooms of any panel sharing the time axis and the dpi of saved figures.
+    """
+
+    def set_full_data(self, x, y, n_columns):
+        """
+        Replaces the full data, decimated over its whole range to
+        `n_columns` until the next draw, which keeps its data limits.
+        """
+        self._full_data = (np.asarray(x), np.asarray(y))
+        self._decimated_view = None
+        x_range = (self._full_data[0].min(), self._full_data[0].max()) \
+            if len(x) else (0, 1)
+        self.set_data(*_decimate_line(*self._full_data, x_range, n_columns))
+
+    def draw(self, renderer):
+        view = (tuple(self.axes.get_xlim()), _pixel_width(self.axes))
+        if view != self._decimated_view:
+            self._decimated_view = view
+            self.set_data(*_decimate_line(*self._full_data, *view))
+        super().draw(renderer)
+
+
+def _plot_decimated(axes, x, y, **kwargs):
+    """
+    Plots a line that is drawn decimated to the visible part of the data and
+    the pixel width of the axes, see `_DecimatedLine`.
+    """
+    # plot an empty line first to style it like axes.plot would
+    styled_line, = axes.plot([], [], **kwargs)
+    line = _DecimatedLine([], [])
+    line.update_from(styled_line)
+    styled_line.remove()
+    line.set_full_data(x, y, _pixel_width(axes))
+    axes.add_line(line)
+    return line
+
+
+def _connect_shared_xlim(axes, callback):
+    """
+    Calls `callback` whenever the limits of the time axis of `axes` change,
+    including zooms of the panels sharing it, for which matplotlib emits
+    'xlim_changed' only on the zoomed axes. The callback receives the zoomed
+    axes, as the limits of its siblings are updated only afterwards.
+    """
+    for sibling in axes.get_shared_x_axes().get_siblings(axes):
+        sibling.callbacks.connect('xlim_changed', callback)
+
+
+def _pattern_hash(params_dict, n_patterns):
+    """
+    Returns the hash values of the patterns from `params_dict`, defaulting
+    to their positions.
+    """
+    pattern_hash = params_dict['pattern_hash']
+    if pattern_hash is None:
+        return list(range(n_patterns))
+    if len(pattern_hash) != n_patterns:
+        raise ValueError(
+            f"length of pattern_hash ({len(pattern_hash)}) should be equal "
+            f"to the number of patterns ({n_patterns})")
+    return list(pattern_hash)
+
+
+def _unitary_events_data(data, joint_surprise_dict, significance_level,
+                         binsize, window_size, window_step, params_dict):
+    """
+    Computes the coordinates of everything `plot_unitary_events` draws as
+    plain arrays in the time and frequency units of `params_dict`. The raster
+    and window geometry are computed once and shared by all patterns.
+    """
+    time_unit = params_dict['time_unit']
+    frequency_unit = params_dict['frequency_unit']
+    n_trials = len(data)
+    n_neurons = len(data[0])
+    t_start = data[0][0].t_start
+    t_stop = data[0][0].t_stop
+    binsize = binsize.rescale(time_unit)
+    window_size = window_size.rescale(time_unit)
+    t_winpos = ue._winpos(t_start, t_stop, window_size,
+                          window_step).rescale(time_unit).magnitude
+    n_windows = len(t_winpos)
+    window_centers = t_winpos + window_size.magnitude / 2.
+    joint_surprise_significance = ue.jointJ(significance_level)
+
+    joint_surprise = _pattern_axis(joint_surprise_dict['Js'], n_windows)
+    n_patterns = joint_surprise.shape[0]
+    coincidence_rate_factor = (1. / (window_size * n_trials)).rescale(
+        frequency_unit).magnitude
+    empirical_rates = _pattern_axis(joint_surprise_dict['n_emp'],
+                                    n_windows) * coincidence_rate_factor
+    expected_rates = _pattern_axis(joint_surprise_dict['n_exp'],
+                                   n_windows) * coincidence_rate_factor
+
+    # coincidence indices are either shared by all patterns or given per
+    # pattern, as 'trial<N>' dictionaries or CoincidenceIndices
+    indices = joint_surprise_dict['indices']
+    if isinstance(indices, (dict, CoincidenceIndices)):
+        coincidence_bins = [_trial_coincidences(indices, n_trials)] * \
+            n_patterns
+    elif len(indices) == n_patterns:
+        coincidence_bins = [_trial_coincidences(pattern_indices, n_trials)
+                            for pattern_indices in indices]
+    else:
+        raise ValueError(
+            f"'indices' should be a dictionary, CoincidenceIndices or a "
+            f"list of {n_patterns} of them, one per pattern")
+
+    coincidences, unitary_events = [], []
+    for pattern in range(n_patterns):
+        significant = joint_surprise[pattern] >= joint_surprise_significance
+        coincidence_times, unitary_event_times = [], []
+        for trial_bins in coincidence_bins[pattern]:
+            times = trial_bins * binsize.magnitude
+            coincidence_times.append([times] * n_neurons)
+            is_unitary = _unitary_event_mask(times, t_winpos,
+                                             window_size.magnitude,
+                                             significant)
+            unitary_event_times.append([times[is_unitary]] * n_neurons)
+        coincidences.append(_raster_coordinates(coincidence_times, n_trials))
+        unitary_events.append(_raster_coordinates(unitary_event_times,
+                                                  n_trials))
+
+    # psth = peristimulus time histogram
+    if params_dict['psth_binsize'] is None:
+        psth_pyramid = None
+        rate_times = window_centers * pq.Quantity(1, time_unit)
+        rates = joint_surprise_dict['rate_avg']
+    else:
+        if params_dict['psth_binsize'] < binsize:
+            raise ValueError(
+                f"psth_binsize ({params_dict['psth_binsize']}) should not be "
+                f"smaller than binsize ({binsize})")
+        psth_pyramid = PSTHPyramid(data, binsize)
+        rate_times, rates = psth_pyramid.rate(params_dict['psth_binsize'])
+
+    return {
+        'n_trials': n_trials,
+        'n_neurons': n_neurons,
+        'n_patterns': n_patterns,
+        'pattern_hash': _pattern_hash(params_dict, n_patterns),
+        'xlim': (t_winpos.min(), t_winpos.max() + window_size.magnitude),
+        't_winpos': t_winpos,
+        'window_centers': window_centers,
+        'raster': _raster_coordinates(
+            [[spiketrain.rescale(time_unit).magnitude
+              for spiketrain in data_trial]
+             for data_trial in data], n_trials),
+        'rate_times': rate_times.rescale(time_unit).magnitude,
+        'rates': rates.rescale(frequency_unit).magnitude,
+        'psth_pyramid': psth_pyramid,
+        'empirical_rates': empirical_rates,
+        'expected_rates': expected_rates,
+        'joint_surprise': joint_surprise,
+        'joint_surprise_significance': joint_surprise_significance,
+        'coincidences': coincidences,
+        'unitary_events': unitary_events,
+    }
+
+
+def _create_ue_axes(figure, params_dict, n_patterns):
+    """
+    Creates the six titled panels of the unitary events figure. In the
+    'facet' layout, the coincidence rates and significance panels are split
+    into one axes per pattern; otherwise their single axes is repeated for
+    each pattern.
+    """
+    figure.subplots_adjust(hspace=params_dict['hspace'],
+                           wspace=params_dict['wspace'],
+                           top=params_dict['top'],
+                           bottom=params_dict['bottom'],
+                           left=params_dict['left'],
+                           right=params_dict['right'])
+    grid = figure.add_gridspec(6, 1)
+    facet = params_dict['pattern_layout'] == 'facet' and n_patterns > 1
+
+    def pattern_axes(slot, title):
+        if not facet:
+            axes = figure.add_subplot(grid[slot], sharex=axes1)
+            axes.set_title(title)
+            return [axes] * n_patterns
+        pattern_grid = grid[slot].subgridspec(n_patterns, 1, hspace=0.1)
+        axes_list = []
+        for pattern in range(n_patterns):
+            axes = figure.add_subplot(pattern_grid[pattern], sharex=axes1)
+            if pattern == 0:
+                axes.set_title(title)
+            if pattern < n_patterns - 1:
+                axes.tick_params(labelbottom=False)
+            axes_list.append(axes)
+        return axes_list
+
+    axes1 = figure.add_subplot(grid[0])
+    axes1.set_title('Spike Events')
+    axes2 = figure.add_subplot(grid[1], sharex=axes1)
+    axes2.set_title('Spike Rates')
+    axes3 = figure.add_subplot(grid[2], sharex=axes1)
+    axes3.set_title('Coincident Events')
+    axes4_list = pattern_axes(3, 'Coincidence Rates')
+    axes5_list = pattern_axes(4, 'Statistical Significance')
+    axes6 = figure.add_subplot(grid[5], sharex=axes1)
+    axes6.set_title('Unitary Events')
+    return FigureUE(axes1, axes2, axes3, axes4_list, axes5_list, axes6)
+
+
+def _result_axes(axes_ue, params_dict, n_patterns):
+    """
+    Returns the axes of the figure as exposed to the user: the per-pattern
+    lists of the coincidence rates and significance panels are collapsed to
+    their single axes unless the layout is faceted.
+    """
+    if params_dict['pattern_layout'] == 'facet' and n_patterns > 1:
+        return axes_ue
+    return axes_ue._replace(
+        coincidence_rates=axes_ue.coincidence_rates[0],
+        statistical_significance=axes_ue.statistical_significance[0])
+
+
+def _setup_raster_axes(axes, n_trials, n_neurons, xlim, params_dict):
+    """
+    Draws the separator between neurons and sets up the trial axis of a
+    raster panel.
+    """
+    axes.axhline(n_trials + 1, lw=params_dict['lw'], color='k')
+    axes.set_xlim(*xlim)
+    axes.set_ylim(0, (n_trials + 1) * n_neurons + 1)
+    axes.xaxis.set_major_locator(MaxNLocator(integer=True))
+    axes.set_yticks([n_trials, n_neurons * n_trials + 1])
+    axes.set_yticklabels([n_trials, n_trials])
+    axes.set_ylabel('Trial', fontsize=params_dict['fsize'])
+
+
+def _unit_id_texts(axes, params_dict):
+    """
+    Labels the neurons of the spike events panel with their unit ids.
+    """
+    top_text = axes.text(1.0, 1.0, f"Unit {params_dict['unit_real_ids'][1]}",
+                         fontsize=params_dict['fsize']//2,
+                         horizontalalignment='right',
+                         verticalalignment='bottom',
+                         transform=axes.transAxes)
+    bottom_text = axes.text(1.0, 0,
+                            f"Unit {params_dict['unit_real_ids'][0]}",
+                            fontsize=params_dict['fsize']//2,
+                            horizontalalignment='right',
+                            verticalalignment='top',
+                            transform=axes.transAxes)
+    return bottom_text, top_text
+
+
+def _setup_significance_axes(axes, xlim, t_winpos, significance_level,
+                             params_dict):
+    """
+    Draws the significance thresholds and sets up the axes of a joint
+    surprise panel.
+    """
+    joint_surprise_significance = ue.jointJ(significance_level)
+    axes.set_xlim(*xlim)
+    axes.set_ylim(params_dict['S_ylim'])
+    axes.axhline(joint_surprise_significance, ls='-', color='r')
+    axes.axhline(-joint_surprise_significance, ls='-', color='g')
+    axes.text(t_winpos[30], joint_surprise_significance + 0.3,
+              '$\\alpha +$', color='r')
+    axes.text(t_winpos[30], -joint_surprise_significance - 0.9,
+              '$\\alpha -$', color='g')
+    axes.xaxis.set_major_locator(MaxNLocator(integer=True))
+    axes.set_yticks([ue.jointJ(1-significance_level), ue.jointJ(0.5),
+                     ue.jointJ(significance_level)])
+    axes.set_yticklabels([1-significance_level, 0.5, significance_level])
+
+
+def _decorate_panels(result, xlim, params_dict):
+    """
+    Marks the epochs on all panels and shows their names under the last
+    panel, and annotates each panel with a letter.
+    """
+    panels = [[result.spike_events], [result.spike_rates],
+              [result.coincident_events],
+              _unique_axes(result.coincidence_rates),
+              _unique_axes(result.statistical_significance),
+              [result.unitary_events]]
+    for letter, panel_axes in zip(string.ascii_uppercase, panels):
+        for axes in panel_axes:
+            _mark_epochs(axes, xlim, params_dict,
+                         is_last_panel=axes is result.unitary_events)
+        panel_axes[0].text(-0.05, 1.1, letter,
+                           transform=panel_axes[0].transAxes,
+                           size=params_dict['fsize'] + 5, weight='bold')
+
+
+def _mark_epochs(axes, xlim, params_dict, is_last_panel):
+    """
+    Marks epochs on the respective axis by creating a vertical line and
+    shows the epoch's name under the last subplot. Epochs need to be
+    defined in the plot_params_user dictionary.
+    Parameters
+    ----------
+    axes : matplotlib.axes.Axes
+        The axes in which the epochs will be marked.
+    xlim : tuple of float
+        The limits of the time axis.
+    params_dict : dict
+        The plotting parameters.
+    is_last_panel : bool
+        Whether `axes` is the bottom panel of the figure.
+    """
+    xlim_left, xlim_right = xlim
+    for key in params_dict['events'].keys():
+        for event_timepoint in params_dict['events'][key]:
+            # check if epochs are between time-axis limits
+            if ((xlim_left <= event_timepoint) and
+                    (event_timepoint <= xlim_right)):
+                axes.axvline(event_timepoint, ls='-',
+                             lw=params_dict['lw'], color='r')
+                if is_last_panel:
+                    axes.text(x=event_timepoint, y=-54, s=key,
+                              fontsize=12, color='r',
+                              horizontalalignment='center')
+
+
+def _nice_ceiling(value):
+    """
+    Rounds a positive value up to a tick-friendly number, so that the y-axis
+    limits of rate panels change rarely between data sets.
+    """
+    if not np.isfinite(value) or value <= 0:
+        return 1.
+    ticks = MaxNLocator(nbins=4, steps=[1, 2, 2.5, 5, 10]).tick_values(
+        0, value)
+    return float(ticks[-1])
+
+
+class _UnitaryEventsFigure(object):
+    """
+    The panels of :func:`plot_unitary_events` in `figure`. The layout and all
+    static decorations are built once with empty data artists, whose data
+    :meth:`update` replaces; both `plot_unitary_events` and
+    :class:`UnitaryEventsTemplate` draw through it. The y-axis limits of the
+    rate panels are rounded up to tick-friendly values, and a PSTH computed
+    with 'psth_binsize' is rebinned whenever the time axis is zoomed.
+    """
+
+    def __init__(self, figure, n_trials, n_neurons, t_start, t_stop,
+                 significance_level, binsize, window_size, window_step,
+                 n_patterns, params_dict):
+        if len(params_dict['unit_real_ids']) != n_neurons:
+            raise ValueError(
+                'length of unit_ids should be equal to number of neurons! \n'
+                f"Unit_Ids: {params_dict['unit_real_ids']} "
+                f"not equal number of neurons: {n_neurons}")
+        pattern_hash = _pattern_hash(params_dict, n_patterns)
+        if params_dict['pattern_layout'] not in ('overlay', 'facet'):
+            raise ValueError(
+                f"pattern_layout should be 'overlay' or 'facet', not "
+                f"'{params_dict['pattern_layout']}'")
+        self.figure = figure
+        self.params_dict = params_dict
+        self.n_trials = n_trials
+        self.n_neurons = n_neurons
+        self.n_patterns = n_patterns
+        self.significance_level = significance_level
+        self.binsize = binsize
+        self.window_size = window_size
+        self.window_step = window_step
+        time_unit = params_dict['time_unit']
+        self._t_winpos = ue._winpos(t_start, t_stop, window_size,
+                                    window_step).rescale(time_unit).magnitude
+        xlim = (self._t_winpos.min(), self._t_winpos.max() +
+                window_size.rescale(time_unit).magnitude)
+
+        axes_ue = self._axes_ue = _create_ue_axes(figure, params_dict,
+                                                  n_patterns)
+        self.axes = _result_axes(axes_ue, params_dict, n_patterns)
+        pattern_colors = _pattern_colors(n_patterns)
+        pattern_labels = [f"pattern {hash_value}"
+                          for hash_value in pattern_hash]
+        empty = np.empty(0)
+
+        self._rasters = []
+        for axes in (axes_ue.spike_events, axes_ue.coincident_events,
+                     axes_ue.unitary_events):
+            line, = axes.plot(empty, empty, ls='none', marker='.',
+                              color='k', markersize=0.5)
+            self._rasters.append(line)
+            _setup_raster_axes(axes, n_trials, n_neurons, xlim, params_dict)
+        self._unit_texts = _unit_id_texts(axes_ue.spike_events, params_dict)
+
+        # psth = peristimulus time histogram
+        axes2 = axes_ue.spike_rates
+        self._rate_lines = [
+            _plot_decimated(
+                axes2, empty, empty, lw=params_dict['lw'],
+                label=f"Unit {params_dict['unit_real_ids'][n]}")
+            for n in range(n_neurons)]
+        axes2.set_xlim(*xlim)
+        axes2.xaxis.set_major_locator(MaxNLocator(integer=True))
+        self._rate_legend = axes2.legend(fontsize=params_dict['fsize']//2)
+        axes2.set_ylabel(f"({params_dict['frequency_unit']})",
+                         fontsize=params_dict['fsize'])
+        self._psth_pyramid = None
+        full_span = xlim[1] - xlim[0]
+
+        def rebin_psth(zoomed_axes):
+            # keep the number of visible bins constant while zooming
+            if self._psth_pyramid is None:
+                return
+            left, right = zoomed_axes.get_xlim()
+            zoomed_binsize = params_dict['psth_binsize'] * \
+                (right - left) / full_span
+            bin_centers, zoomed_rates = self._psth_pyramid.rate(
+                zoomed_binsize)
+            zoomed_rates = zoomed_rates.rescale(
+                params_dict['frequency_unit']).magnitude
+            for n, line in enumerate(self._rate_lines):
+                line.set_full_data(bin_centers.magnitude, zoomed_rates[:, n],
+                                   _pixel_width(axes2))
+
+        _connect_shared_xlim(axes2, rebin_psth)
+
+        self._coincidences, self._unitary_events = [], []
+        self._empirical_rates, self._expected_rates = [], []
+        self._joint_surprise = []
+        for pattern in range(n_patterns):
+            label = pattern_labels[pattern]
+            for axes, lines, color_key in (
+                    (axes_ue.coincident_events, self._coincidences,
+                     'coincidences'),
+                    (axes_ue.unitary_events, self._unitary_events,
+                     'unitary_events')):
+                lines.append(axes.plot(
+                    empty, empty, ls='', markersize=params_dict['marker_size'],
+                    marker='s', markerfacecolor='none',
+                    markeredgecolor=pattern_colors[color_key][pattern],
+                    label=label)[0])
+            if n_patterns == 1:
+                labels = ('Empirical', 'Expected')
+            else:
+                labels = (f"Empirical, {label}", f"Expected, {label}")
+            axes4 = axes_ue.coincidence_rates[pattern]
+            self._empirical_rates.append(_plot_decimated(
+                axes4, empty, empty, label=labels[0], lw=params_dict['lw'],
+                color=pattern_colors['empirical'][pattern]))
+            self._expected_rates.append(_plot_decimated(
+                axes4, empty, empty, label=labels[1], lw=params_dict['lw'],
+                color=pattern_colors['expected'][pattern],
+                ls=pattern_colors['expected_style']))
+            self._joint_surprise.append(_plot_decimated(
+                axes_ue.statistical_significance[pattern], empty, empty,
+                lw=params_dict['lw'], label=label,
+                color=pattern_colors['joint_surprise'][pattern]))
+
+        for axes4 in _unique_axes(axes_ue.coincidence_rates):
+            axes4.set_xlim(*xlim)
+            axes4.xaxis.set_major_locator(MaxNLocator(integer=True))
+            axes4.legend(fontsize=params_dict['fsize']//2)
+            axes4.set_ylabel(f"({params_dict['frequency_unit']})",
+                             fontsize=params_dict['fsize'])
+        for axes5 in _unique_axes(axes_ue.statistical_significance):
+            _setup_significance_axes(axes5, xlim, self._t_winpos,
+                                     significance_level, params_dict)
+        if n_patterns > 1:
+            for axes in [axes_ue.coincident_events, axes_ue.unitary_events] \
+                    + _unique_axes(axes_ue.statistical_significance):
+                axes.legend(fontsize=params_dict['fsize']//2)
+        axes_ue.unitary_events.set_xlabel(
+            f'Time ({params_dict["time_unit"]})',
+            fontsize=params_dict['fsize'])
+        _decorate_panels(axes_ue, xlim, params_dict)
+
+    def _set_rate_ylim(self, axes, max_value):
+        top = _nice_ceiling(max_value)
+        if axes.get_ylim() != (0, top):
+            axes.set_ylim(0, top)
+            axes.set_yticks([0, top / 2, top])
+
+    def update(self, data, joint_surprise_dict, unit_real_ids=None):
+        """
+        Replaces the data shown in the figure.
+
+        Parameters
+        ----------
+        data : list of list of neo.SpikeTrain
+            See :func:`plot_unitary_events`. It must have the number of
+            trials and neurons given to the template and is not modified.
+        joint_surprise_dict : dict
+            See :func:`plot_unitary_events`. It must have the analysis
+            windows and the number of patterns of the template.
+        unit_real_ids : list, optional
+            The unit ids from the experimental recording. If None, the
+            previous ids are kept.
+
+        Returns
+        -------
+        _UnitaryEventsFigure
+            The figure itself.
+
+        Raises
+        ------
+        ValueError
+            If the data do not match the geometry of the template.
+        """
+        if len(data) != self.n_trials or len(data[0]) != self.n_neurons:
+            raise ValueError(
+                f"The template expects {self.n_trials} trials of "
+                f"{self.n_neurons} neurons, got {len(data)} trials of "
+                f"{len(data[0])} neurons")
+        if unit_real_ids is not None:
+            if len(unit_real_ids) != self.n_neurons:
+                raise ValueError(
+                    'length of unit_ids should be equal to number of '
+                    'neurons!')
+            self.params_dict['unit_real_ids'] = list(unit_real_ids)
+        ue_data = _unitary_events_data(
+            data, joint_surprise_dict, self.significance_level, self.binsize,
+            self.window_size, self.window_step, self.params_dict)
+        if ue_data['n_patterns'] != self.n_patterns or \
+                len(ue_data['t_winpos']) != len(self._t_winpos):
+            raise ValueError(
+                "The analysis windows or the number of patterns of "
+                "'joint_surprise_dict' do not match the template")
+
+        def set_decimated_data(line, x, y):
+            line.set_full_data(x, y, _pixel_width(line.axes))
+
+        self._psth_pyramid = ue_data['psth_pyramid']
+        for line in self._rasters:
+            line.set_data(*ue_data['raster'])
+        for n, line in enumerate(self._rate_lines):
+            set_decimated_data(line, ue_data['rate_times'],
+                               ue_data['rates'][:, n])
+        for pattern in range(self.n_patterns):
+            self._coincidences[pattern].set_data(
+                *ue_data['coincidences'][pattern])
+            self._unitary_events[pattern].set_data(
+                *ue_data['unitary_events'][pattern])
+            set_decimated_data(self._empirical_rates[pattern],
+                               ue_data['window_centers'],
+                               ue_data['empirical_rates'][pattern])
+            set_decimated_data(self._expected_rates[pattern],
+                               ue_data['window_centers'],
+                               ue_data['expected_rates'][pattern])
+            set_decimated_data(self._joint_surprise[pattern],
+                               ue_data['window_centers'],
+                               ue_data['joint_surprise'][pattern])
+
+        unit_labels = [f"Unit {unit_id}"
+                       for unit_id in self.params_dict['unit_real_ids']]
+        self._unit_texts[0].set_text(unit_labels[0])
+        self._unit_texts[1].set_text(unit_labels[1])
+        for text, label in zip(self._rate_legend.get_texts(), unit_labels):
+            text.set_text(label)
+
+        self._set_rate_ylim(self.axes.spike_rates, ue_data['rates'].max())
+        coincidence_rates = np.maximum(ue_data['empirical_rates'],
+                                       ue_data['expected_rates'])
+        axes4_list = self._axes_ue.coincidence_rates
+        for axes4 in _unique_axes(axes4_list):
+            patterns = [pattern for pattern in range(self.n_patterns)
+                        if axes4_list[pattern] is axes4]
+            self._set_rate_ylim(axes4, coincidence_rates[patterns].max())
+        return self
+
 
 def plot_unitary_events(data, joint_surprise_dict, significance_level, binsize,
                         window_size, window_step, **plot_params_user):
@@ -68,12 +1081,16 @@ def plot_unitary_events(data, joint_surprise_dict, significance_level, binsize,
         function. The values of each key has the shape of
             different pattern hash --> 0-axis
             different window --> 1-axis
+        A 1D array is treated as the result of a single pattern.
         Keys:
         -----
         Js : list of float
             JointSurprise of different given pattern within each window.
-        indices : list of list of int
-            A list of indices of pattern within each window.
+        indices : dict or CoincidenceIndices or list of them
+            The bin indices of the coincidences in each trial, with keys
+            'trial0', 'trial1', ..., or in the compact layout of
+            :class:`CoincidenceIndices`. If a list is given, each pattern has
+            its own coincidences; otherwise they are shared by all patterns.
         n_emp : list of int
         The empirical number of each observed pattern.
         n_exp : list of float
@@ -126,6 +1143,24 @@ def plot_unitary_events(data, joint_surprise_dict, significance_level, binsize,
             The time unit used to rescale the spiketrains.
         frequency_unit : string (default: 'Hz')
             The frequency unit used to rescale the spikerates.
+        psth_binsize : quantities.Quantity or None (default: None)
+            If None, the spike rates panel shows `rate_avg` at the resolution
+            of the analysis windows. Otherwise, a PSTH with this bin width is
+            computed directly from `data` (see :class:`PSTHPyramid`) and
+            rebinned from its cached resolutions when the time axis of any
+            panel is zoomed, keeping the number of visible bins constant.
+            The finest resolution is `binsize`: a smaller `psth_binsize`
+            raises a ValueError, and bin widths are rounded to multiples of
+            `binsize`, also while zooming.
+        pattern_hash : list of int or None (default: None)
+            The hash values of the patterns along the 0-axis of `Js`, `n_emp`
+            and `n_exp`, used to label them. If None, the patterns are
+            labeled by their position.
+        pattern_layout : {'overlay', 'facet'} (default: 'overlay')
+            Whether the coincidence rates and the significance of several
+            patterns are overlaid in one axes each, or drawn in one axes per
+            pattern. The raster panels always show the coincidences and
+            unitary events of all patterns, colored per pattern.
     Returns
     -------
     result : instance of namedtuple()
@@ -135,6 +1170,8 @@ def plot_unitary_events(data, joint_surprise_dict, significance_level, binsize,
         Identifiers: spike_events_axes, spike_rates_axes,
                      coincidence_events_axes, coincidence_rates_axes,
                      statistical_significance_axes, unitary_events_axes
+        In the 'facet' layout with several patterns, coincidence_rates and
+        statistical_significance are lists with one axes per pattern.
     """
     # update params_dict_default with user input
     params_dict = params_dict_default.copy()
@@ -145,241 +1182,466 @@ def plot_unitary_events(data, joint_surprise_dict, significance_level, binsize,
         for n in range(len(data[0])):
             data[m][n] = data[m][n].rescale(params_dict['time_unit'])
 
-    # set common variables
-    n_neurons = len(data[0])
     t_start = data[0][0].t_start
     t_stop = data[0][0].t_stop
-    t_winpos = ue._winpos(t_start, t_stop, window_size, window_step)
-    center_of_analysis_window = t_winpos + window_size / 2.
-    n_trials = len(data)
-    joint_surprise_significance = ue.jointJ(significance_level)
-    xlim_left = (min(t_winpos)).magnitude
-    xlim_right = (max(t_winpos) + window_size).magnitude
+    n_windows = len(ue._winpos(t_start, t_stop, window_size, window_step))
+    n_patterns = _pattern_axis(joint_surprise_dict['Js'],
+                               n_windows).shape[0]
 
-    if len(params_dict['unit_real_ids']) != n_neurons:
-        raise ValueError(
-            'length of unit_ids should be equal to number of neurons! \n'
-            'Unit_Ids: ' + params_dict['unit_real_ids']
-            + 'not equal number of neurons: ' + n_neurons)
-
-    plt.figure(num=1, figsize=params_dict['figsize'])
-    plt.subplots_adjust(hspace=params_dict['hspace'],
-                        wspace=params_dict['wspace'],
-                        top=params_dict['top'],
-                        bottom=params_dict['bottom'],
-                        left=params_dict['left'],
-                        right=params_dict['right'])
-
-    # set y-axis for raster plots with ticks and labels
-    y_ticks_list = [n_trials, n_neurons * n_trials + 1]
-    y_ticks_labels_list = [n_trials, n_trials]
-
-    def mark_epochs(axes_name):
+    print('plotting Unitary Event Analysis ...')
+    figure = plt.figure(num=1, figsize=params_dict['figsize'])
+    figure.clf()
+    ue_figure = _UnitaryEventsFigure(
+        figure, len(data), len(data[0]), t_start, t_stop, significance_level,
+        binsize, window_size, window_step, n_patterns, params_dict)
+    ue_figure.update(data, joint_surprise_dict)
+    return ue_figure.axes
+
+
+class UnitaryEventsTemplate(_UnitaryEventsFigure):
+    """
+    Reusable figure of :func:`plot_unitary_events` to render the results of
+    many neuron pairs at a fixed cost per pair.
+
+    The layout and all static decorations (titles, tick locators, labels,
+    epoch lines, significance thresholds and panel letters) are built once.
+    :meth:`update` swaps the data of the existing artists, and
+    :meth:`savefig` blits them onto a cached rendering of the static
+    background. The background is rendered again only if the limits of a
+    panel change; the limits of the rate panels are rounded up to
+    tick-friendly values to make this rare.
+
+    Parameters
+    ----------
+    n_trials : int
+        The number of trials of each data set.
+    n_neurons : int
+        The number of neurons of each data set.
+    t_start : quantities.Quantity
+        The start time of the spike trains.
+    t_stop : quantities.Quantity
+        The stop time of the spike trains.
+    significance_level : float
+        See :func:`plot_unitary_events`.
+    binsize : quantities.Quantity
+        See :func:`plot_unitary_events`.
+    window_size : quantities.Quantity
+        See :func:`plot_unitary_events`.
+    window_step : quantities.Quantity
+        See :func:`plot_unitary_events`.
+    n_patterns : int, optional
+        The number of patterns of each `joint_surprise_dict`.
+        Default: 1
+    plot_params_user : dict
+        The plotting parameters of :func:`plot_unitary_events`.
+        'unit_real_ids' can be changed with each :meth:`update`.
+
+    Attributes
+    ----------
+    figure : matplotlib.figure.Figure
+        The figure, which is not managed by `pyplot`.
+    axes : FigureUE
+        The axes of the figure as returned by :func:`plot_unitary_events`.
+
+    Examples
+    --------
+    >>> template = UnitaryEventsTemplate(
+    ...     n_trials=36, n_neurons=2, t_start=0 * pq.ms, t_stop=2100 * pq.ms,
+    ...     significance_level=0.05, binsize=5 * pq.ms,
+    ...     window_size=100 * pq.ms, window_step=10 * pq.ms)
+    >>> for pair_id, (spiketrains, UE) in enumerate(pairs):
+    ...     template.update(spiketrains, UE, unit_real_ids=pair_ids[pair_id])
+    ...     template.savefig(f"UE_pair_{pair_id}.png")
+    """
+
+    def __init__(self, n_trials, n_neurons, t_start, t_stop,
+                 significance_level, binsize, window_size, window_step,
+                 n_patterns=1, **plot_params_user):
+        params_dict = params_dict_default.copy()
+        params_dict.update(plot_params_user)
+        figure = Figure(figsize=params_dict['figsize'])
+        FigureCanvasAgg(figure)
+        super().__init__(figure, n_trials, n_neurons, t_start, t_stop,
+                         significance_level, binsize, window_size,
+                         window_step, n_patterns, params_dict)
+
+        # the artists that change with the data are excluded from the
+        # rendering of the static background
+        self._dynamic_artists = self._rasters + self._rate_lines + \
+            self._coincidences + self._unitary_events + \
+            self._empirical_rates + self._expected_rates + \
+            self._joint_surprise + list(self._unit_texts) + \
+            [self._rate_legend]
+        self._set_animated(True)
+        self._background = None
+
+    def _set_animated(self, animated):
+        for artist in self._dynamic_artists:
+            artist.set_animated(animated)
+
+    def render(self):
         """
-        Marks epochs on the respective axis by creating a vertical line and
-        shows the epoch's name under the last subplot. Epochs need to be
-        defined in the plot_params_user dictionary.
+        Renders the figure, drawing the static background only if it is not
+        cached yet for the current limits of the panels.
+
+        Returns
+        -------
+        np.ndarray
+            The RGBA pixels of the figure, a view of the canvas buffer.
+        """
+        canvas = self.figure.canvas
+        view = [(axes.get_xlim(), axes.get_ylim())
+                for axes in self.figure.axes]
+        if self._background is None or view != self._background_view:
+            # animated artists are skipped by a full draw
+            canvas.draw()
+            self._background = canvas.copy_from_bbox(self.figure.bbox)
+            self._background_view = view
+        else:
+            canvas.restore_region(self._background)
+        for artist in self._dynamic_artists:
+            artist.axes.draw_artist(artist)
+        return np.asarray(canvas.buffer_rgba())
+
+    def savefig(self, fname, **kwargs):
+        """
+        Saves the figure.
+
+        PNG files without further keyword arguments are written from
+        :meth:`render`. Any other format or keyword argument falls back to
+        `matplotlib.figure.Figure.savefig`, which renders the whole figure.
+
         Parameters
         ----------
-        axes_name : matplotlib.axes._subplots.AxesSubplot
-            The axes in which the epochs will be marked.
+        fname : str or path-like or file-like
+            The output file.
+        kwargs : dict
+            Keyword arguments of `matplotlib.figure.Figure.savefig`.
         """
-        for key in params_dict['events'].keys():
-            for event_timepoint in params_dict['events'][key]:
-                # check if epochs are between time-axis limits
-                if ((xlim_left <= event_timepoint) and
-                        (event_timepoint <= xlim_right)):
-                    axes_name.axvline(event_timepoint, ls='-',
-                                      lw=params_dict['lw'], color='r')
-                    if axes_name.get_geometry()[2] == 6:
-                        axes_name.text(x=event_timepoint, y=-54, s=key,
-                                       fontsize=12, color='r',
-                                       horizontalalignment='center')
+        is_png = not isinstance(fname, (str, os.PathLike)) or \
+            os.fspath(fname).lower().endswith('.png')
+        if is_png and not kwargs:
+            mpimg.imsave(fname, self.render(), format='png',
+                         dpi=self.figure.dpi)
+            return
+        self._set_animated(False)
+        try:
+            self.figure.savefig(fname, **kwargs)
+        finally:
+            self._set_animated(True)
 
-    print('plotting Unitary Event Analysis ...')
 
-    print('plotting Spike Events ...')
-    axes1 = plt.subplot(6, 1, 1)
-    axes1.set_title('Spike Events')
-    for n in range(n_neurons):
-        for trial, data_trial in enumerate(data):
-            spike_events_on_timescale = data_trial[n].magnitude
-            spike_events_on_trialscale = \
-                np.full_like(data_trial[n].magnitude, trial) + \
-                n * (n_trials + 1) + 1
-            axes1.plot(spike_events_on_timescale, spike_events_on_trialscale,
-                       ls='none', marker='.', color='k', markersize=0.5)
-    axes1.axhline(n_trials + 1, lw=params_dict['lw'], color='k')
-    axes1.set_xlim(xlim_left, xlim_right)
-    axes1.set_ylim(0, (n_trials + 1) * n_neurons + 1)
-    axes1.xaxis.set_major_locator(MaxNLocator(integer=True))
-    axes1.set_yticks(y_ticks_list)
-    axes1.set_yticklabels(y_ticks_labels_list)
-    axes1.text(1.0, 1.0, f"Unit {params_dict['unit_real_ids'][1]}",
-               fontsize=params_dict['fsize']//2,
-               horizontalalignment='right',
-               verticalalignment='bottom',
-               transform=axes1.transAxes)
-    axes1.text(1.0, 0, f"Unit {params_dict['unit_real_ids'][0]}",
-               fontsize=params_dict['fsize']//2,
-               horizontalalignment='right',
-               verticalalignment='top',
-               transform=axes1.transAxes)
-    axes1.set_ylabel('Trial', fontsize=params_dict['fsize'])
-
-    print('plotting Spike Rates ...')
-    axes2 = plt.subplot(6, 1, 2, sharex=axes1)
-    axes2.set_title('Spike Rates')
-    # psth = peristimulus time histogram
-    max_val_psth = 0
-    for n in range(n_neurons):
-        respective_rate_average = joint_surprise_dict['rate_avg'][:, n].\
-            rescale(params_dict['frequency_unit'])
-        axes2.plot(center_of_analysis_window, respective_rate_average,
-                   label=f"Unit {params_dict['unit_real_ids'][n]}",
-                   lw=params_dict['lw'])
-        if max(joint_surprise_dict['rate_avg'][:, n]) > max_val_psth:
-            max_val_psth = max(joint_surprise_dict['rate_avg'][:, n])
-    axes2.set_xlim(xlim_left, xlim_right)
-    max_val_psth = max_val_psth.rescale(
-        params_dict['frequency_unit']).magnitude
-    axes2.set_ylim(0, max_val_psth + max_val_psth/10)
-    axes2.xaxis.set_major_locator(MaxNLocator(integer=True))
-    axes2.set_yticks([0, int(max_val_psth / 2), int(max_val_psth)])
-    axes2.legend(fontsize=params_dict['fsize']//2)
-    axes2.set_ylabel(f"({params_dict['frequency_unit']})",
-                     fontsize=params_dict['fsize'])
-
-    print('plotting Coincident Events ...')
-    axes3 = plt.subplot(6, 1, 3, sharex=axes1)
-    axes3.set_title('Coincident Events')
-    for n in range(n_neurons):
-        for trial, data_trial in enumerate(data):
-            spike_events_on_timescale = data_trial[n].magnitude
-            spike_events_on_trialscale = \
-                np.full_like(data_trial[n].magnitude, trial) + \
-                n * (n_trials + 1) + 1
-            axes3.plot(spike_events_on_timescale, spike_events_on_trialscale,
-                       ls='none', marker='.', color='k', markersize=0.5)
-            indices_of_coincidence_events = \
-                np.unique(joint_surprise_dict['indices']['trial' + str(trial)])
-            coincidence_events_on_timescale = \
-                indices_of_coincidence_events * binsize
-            coincidence_events_on_trialscale = np.full_like(
-                indices_of_coincidence_events, trial) + n * (n_trials + 1) + 1
-            axes3.plot(coincidence_events_on_timescale,
-                       coincidence_events_on_trialscale, ls='',
-                       markersize=params_dict['marker_size'], marker='s',
-                       markerfacecolor='none', markeredgecolor='c')
-    axes3.axhline(n_trials + 1, lw=params_dict['lw'], color='k')
-    axes3.set_xlim(xlim_left, xlim_right)
-    axes3.set_ylim(0, (n_trials + 1) * n_neurons + 1)
-    axes3.xaxis.set_major_locator(MaxNLocator(integer=True))
-    axes3.set_yticks(y_ticks_list)
-    axes3.set_yticklabels(y_ticks_labels_list)
-    axes3.set_ylabel('Trial', fontsize=params_dict['fsize'])
-
-    print('plotting Coincidence Rates ..')
-    axes4 = plt.subplot(6, 1, 4, sharex=axes1)
-    axes4.set_title('Coincidence Rates')
-    empirical_coincidence_rate = joint_surprise_dict['n_emp'] / \
-        (window_size.rescale('s').magnitude * n_trials)
-    expected_coincidence_rate = joint_surprise_dict['n_exp'] / \
-        (window_size.rescale('s').magnitude * n_trials)
-    axes4.plot(center_of_analysis_window, empirical_coincidence_rate,
-               label='Empirical', lw=params_dict['lw'], color='c')
-    axes4.plot(center_of_analysis_window, expected_coincidence_rate,
-               label='Expected', lw=params_dict['lw'], color='m')
-    axes4.set_xlim(xlim_left, xlim_right)
-    axes4.xaxis.set_major_locator(MaxNLocator(integer=True))
-    y_ticks = axes4.get_ylim()
-    axes4.set_yticks([0, y_ticks[1] / 2, y_ticks[1]])
-    axes4.legend(fontsize=params_dict['fsize']//2)
-    axes4.set_ylabel(f"({params_dict['frequency_unit']})",
-                     fontsize=params_dict['fsize'])
-
-    print('plotting Statistical Significance ...')
-    axes5 = plt.subplot(6, 1, 5, sharex=axes1)
-    axes5.set_title('Statistical Significance')
-    joint_surprise_values = joint_surprise_dict['Js']
-    axes5.plot(center_of_analysis_window, joint_surprise_values,
-               lw=params_dict['lw'], color='k')
-    axes5.set_xlim(xlim_left, xlim_right)
-    axes5.set_ylim(params_dict['S_ylim'])
-    axes5.axhline(joint_surprise_significance, ls='-', color='r')
-    axes5.axhline(-joint_surprise_significance, ls='-', color='g')
-    axes5.text(t_winpos[30], joint_surprise_significance + 0.3, '$\\alpha +$',
-               color='r')
-    axes5.text(t_winpos[30], -joint_surprise_significance - 0.9, '$\\alpha -$',
-               color='g')
-    axes5.xaxis.set_major_locator(MaxNLocator(integer=True))
-    axes5.set_yticks([ue.jointJ(1-significance_level), ue.jointJ(0.5),
-                      ue.jointJ(significance_level)])
-    axes5.set_yticklabels([1-significance_level, 0.5, significance_level])
-
-    print('plotting Unitary Events ...')
-    axes6 = plt.subplot(6, 1, 6, sharex=axes1)
-    axes6.set_title('Unitary Events')
-    for n in range(n_neurons):
-        for trial, data_trial in enumerate(data):
-            spike_events_on_timescale = data_trial[n].magnitude
-            spike_events_on_trialscale = \
-                np.full_like(data_trial[n].magnitude, trial) + \
-                n * (n_trials + 1) + 1
-            axes6.plot(spike_events_on_timescale, spike_events_on_trialscale,
-                       ls='None', marker='.', markersize=0.5, color='k')
-            indices_of_significant_joint_surprises = np.where(
-                joint_surprise_dict['Js'] >= joint_surprise_significance)[0]
-            if len(indices_of_significant_joint_surprises) > 0:
-                indices_of_coincidence_events = np.unique(
-                    joint_surprise_dict['indices']['trial' + str(trial)])
-                if len(indices_of_coincidence_events) > 0:
-                    indices_of_unitary_events = []
-                    for j in indices_of_significant_joint_surprises:
-                        coincidence_indices_greater_left_window_margin = \
-                            indices_of_coincidence_events * binsize >= \
-                            t_winpos[j]
-                        coincidence_indices_smaller_right_window_margin = \
-                            indices_of_coincidence_events * binsize < \
-                            t_winpos[j] + window_size
-                        coincidence_indices_in_actual_analysis_window = \
-                            coincidence_indices_greater_left_window_margin & \
-                            coincidence_indices_smaller_right_window_margin
-                        indices_of_unitary_events = \
-                            np.append(
-                                indices_of_unitary_events,
-                                indices_of_coincidence_events
-                                [coincidence_indices_in_actual_analysis_window]
-                                )
-                    unitary_events_on_timescale = \
-                        np.unique(indices_of_unitary_events) * binsize
-                    unitary_events_on_trialscale = \
-                        np.ones_like(np.unique(indices_of_unitary_events)) * \
-                        trial + n * (n_trials + 1) + 1
-                    axes6.plot(unitary_events_on_timescale,
-                               unitary_events_on_trialscale,
-                               markersize=params_dict['marker_size'],
-                               marker='s', ls='', markerfacecolor='none',
-                               markeredgecolor='r')
-    axes6.axhline(n_trials + 1, lw=params_dict['lw'], color='k')
-    axes6.set_xlim(xlim_left, xlim_right)
-    axes6.set_ylim(0, (n_trials + 1) * n_neurons + 1)
-    axes6.xaxis.set_major_locator(MaxNLocator(integer=True))
-    axes6.set_yticks(y_ticks_list)
-    axes6.set_yticklabels(y_ticks_labels_list)
-    axes6.set_xlabel(f'Time ({params_dict["time_unit"]})',
-                     fontsize=params_dict['fsize'])
-    axes6.set_ylabel('Trial', fontsize=params_dict['fsize'])
-
-    # mark all epochs on all subplots and annotate all axes-subplots
-    for n in range(6):
-        axes_list = [axes1, axes2, axes3, axes4, axes5, axes6]
-        letter_list = ['A', 'B', 'C', 'D', 'E', 'F']
-        mark_epochs(eval(f"axes{n+1}"))
-        axes = axes_list[n]
-        letter = letter_list[n]
-        axes.text(-0.05, 1.1, letter, transform=axes.transAxes,
-                  size=params_dict['fsize'] + 5, weight='bold')
-
-    result = FigureUE(axes1, axes2, axes3, axes4, axes5, axes6)
-    return result
+# number of pairs read at once from a (memory-mapped) summary array by
+# plot_unitary_events_summary, which bounds its memory
+SUMMARY_CHUNK_SIZE = 4096
+
+# the largest number of rows and columns of the coarse level to which
+# plot_unitary_events_summary pools the whole array once, so that views
+# showing at least one of its blocks per pixel do not read the array again
+SUMMARY_COARSE_SIZE = 2048
+
+
+def stack_joint_surprise(joint_surprise_dicts, filename=None, n_pairs=None):
+    """
+    Stacks the joint surprise of many neuron pairs into a single float32
+    array of shape (n_pairs, n_windows), the input of
+    :func:`plot_unitary_events_summary`.
+
+    Parameters
+    ----------
+    joint_surprise_dicts : iterable of dict or of np.ndarray
+        The outputs of
+        `elephant.unitary_event_analysis.jointJ_window_analysis` for a single
+        pattern each, or their 'Js' arrays.
+    filename : str or path-like or None
+        If given, the array is written pair by pair to this `.npy` file
+        instead of being held in memory, and can later be opened with
+        ``np.load(filename, mmap_mode='r')``.
+        Default: None
+    n_pairs : int or None
+        The number of pairs, required if `filename` is given and
+        `joint_surprise_dicts` has no length.
+        Default: None
+
+    Returns
+    -------
+    joint_surprise : np.ndarray or np.memmap
+        The joint surprise with the pairs on the 0-axis and the windows on
+        the 1-axis.
+    """
+    if n_pairs is None:
+        n_pairs = len(joint_surprise_dicts)
+    joint_surprise = None
+    for pair, joint_surprise_dict in enumerate(joint_surprise_dicts):
+        if isinstance(joint_surprise_dict, dict):
+            joint_surprise_dict = joint_surprise_dict['Js']
+        pair_surprise = np.ravel(joint_surprise_dict)
+        if joint_surprise is None:
+            shape = (n_pairs, len(pair_surprise))
+            if filename is None:
+                joint_surprise = np.empty(shape, dtype=np.float32)
+            else:
+                joint_surprise = np.lib.format.open_memmap(
+                    filename, mode='w+', dtype=np.float32, shape=shape)
+        if len(pair_surprise) != joint_surprise.shape[1]:
+            raise ValueError(
+                f"pair {pair} has {len(pair_surprise)} windows, but the "
+                f"first pair has {joint_surprise.shape[1]}")
+        joint_surprise[pair] = pair_surprise
+    if joint_surprise is None:
+        raise ValueError("joint_surprise_dicts is empty")
+    if isinstance(joint_surprise, np.memmap):
+        joint_surprise.flush()
+    return joint_surprise
+
+
+def _pixel_edges(start, stop, n_pixels):
+    """
+    Returns the first array index of each pixel and the end of the last one
+    when the indices [start, stop) are shown with at most `n_pixels` pixels.
+    """
+    n_pixels = max(min(stop - start, int(n_pixels)), 1)
+    return np.linspace(start, stop, n_pixels + 1).astype(np.int64)
+
+
+def _pool_image(values, row_edges, column_edges, ufunc, transform=None):
+    """
+    Pools the rows and columns of `values` between the edges to one value
+    per pixel with `ufunc`, either `np.fmax` or `np.add`, reading the rows
+    in chunks of `SUMMARY_CHUNK_SIZE`. Each chunk is passed through
+    `transform` first, if given.
+    """
+    image = np.full((len(row_edges) - 1, len(column_edges) - 1),
+                    0 if ufunc is np.add else np.nan)
+    column_starts = column_edges[:-1] - column_edges[0]
+    for chunk_start in range(row_edges[0], row_edges[-1],
+                             SUMMARY_CHUNK_SIZE):
+        chunk_stop = min(chunk_start + SUMMARY_CHUNK_SIZE, row_edges[-1])
+        chunk = np.asarray(values[chunk_start:chunk_stop,
+                                  column_edges[0]:column_edges[-1]])
+        if transform is not None:
+            chunk = transform(chunk)
+        # the pixel rows within this chunk, the first possibly continuing
+        # from the previous chunk
+        pixels = np.arange(
+            np.searchsorted(row_edges, chunk_start, side='right') - 1,
+            np.searchsorted(row_edges, chunk_stop, side='left'))
+        row_starts = np.maximum(row_edges[pixels], chunk_start) - chunk_start
+        pooled = ufunc.reduceat(ufunc.reduceat(chunk, column_starts, axis=1),
+                                row_starts, axis=0)
+        image[pixels] = ufunc(image[pixels], pooled)
+    return image
+
+
+def _summary_image(joint_surprise, row_edges, column_edges, threshold):
+    """
+    Downsamples the pairs and windows between the edges to one value per
+    pixel. With a `threshold`, a pixel counts the significant windows of its
+    pairs; otherwise it keeps their maximum joint surprise, so that no
+    excursion is lost.
+    """
+    if threshold is None:
+        return _pool_image(joint_surprise, row_edges, column_edges, np.fmax)
+    return _pool_image(joint_surprise, row_edges, column_edges, np.add,
+                       lambda chunk: (chunk >= threshold).astype(np.int64))
+
+
+def _visible_range(limits, n):
+    """
+    Returns the first and the end index of the rows or columns visible
+    within `limits`, given in index units. A view past the data keeps
+    showing its first or last index.
+    """
+    start, stop = np.clip(limits, 0, n)
+    start = min(start, n - 1)
+    return start, max(stop, start + 1)
+
+
+class _SummaryImage(mpimg.AxesImage):
+    """
+    Image of the joint surprise of many pairs, downsampled with
+    `_summary_image` to the visible pairs and windows and to the size of the
+    axes in pixels. The pooling is redone at draw time whenever the limits
+    or the size of the axes have changed, so that a zoom pools only once.
+
+    The whole array is pooled once to a coarse level of at most
+    `SUMMARY_COARSE_SIZE` blocks per dimension, from which the views showing
+    at least one block per pixel are pooled instead of from the array.
+    """
+
+    def set_summary(self, joint_surprise, threshold, first_left, step):
+        """
+        Sets the joint surprise of shape (n_pairs, n_windows), with column k
+        spanning `first_left + k * step` to `first_left + (k + 1) * step`,
+        and shows all of it.
+        """
+        self._joint_surprise = joint_surprise
+        self._threshold = threshold
+        self._first_left = first_left
+        self._step = step
+        self._pooled_view = None
+        n_pairs, n_windows = joint_surprise.shape
+        self._block = (-(-n_pairs // SUMMARY_COARSE_SIZE),
+                       -(-n_windows // SUMMARY_COARSE_SIZE))
+        self._coarse = None
+        if self._block != (1, 1):
+            self._coarse = _summary_image(
+                joint_surprise,
+                np.r_[0:n_pairs:self._block[0], n_pairs],
+                np.r_[0:n_windows:self._block[1], n_windows], threshold)
+        bbox = self.axes.get_window_extent()
+        self._pool_view((first_left, first_left + n_windows * step),
+                        (-0.5, n_pairs - 0.5), bbox.width, bbox.height)
+
+    def _pool_view(self, xlim, ylim, width, height):
+        n_pairs, n_windows = self._joint_surprise.shape
+        rows = _visible_range(
+            np.round(np.sort(ylim) + 0.5).astype(np.int64), n_pairs)
+        columns = _visible_range(
+            np.floor((np.sort(xlim) - self._first_left) / self._step)
+            .astype(np.int64) + [0, 1], n_windows)
+        row_block, column_block = self._block
+        if self._coarse is not None and \
+                (row_block == 1 or rows[1] - rows[0] >= row_block * height) \
+                and (column_block == 1 or
+                     columns[1] - columns[0] >= column_block * width):
+            # pool the blocks overlapping the view
+            row_edges = _pixel_edges(rows[0] // row_block,
+                                     -(-rows[1] // row_block), height)
+            column_edges = _pixel_edges(columns[0] // column_block,
+                                        -(-columns[1] // column_block),
+                                        width)
+            image_data = _pool_image(
+                self._coarse, row_edges, column_edges,
+                np.fmax if self._threshold is None else np.add)
+            row_edges = np.minimum(row_edges * row_block, n_pairs)
+            column_edges = np.minimum(column_edges * column_block, n_windows)
+        else:
+            row_edges = _pixel_edges(*rows, height)
+            column_edges = _pixel_edges(*columns, width)
+            image_data = _summary_image(self._joint_surprise, row_edges,
+                                        column_edges, self._threshold)
+        self.set_data(image_data)
+        self.set_extent((self._first_left + column_edges[0] * self._step,
+                         self._first_left + column_edges[-1] * self._step,
+                         row_edges[-1] - 0.5, row_edges[0] - 0.5))
+        if self._threshold is not None:
+            self.set_clim(0, max(image_data.max(), 1))
+
+    def draw(self, renderer, *args, **kwargs):
+        bbox = self.axes.get_window_extent()
+        view = (tuple(self.axes.get_xlim()), tuple(self.axes.get_ylim()),
+                int(bbox.width), int(bbox.height))
+        if view != self._pooled_view:
+            self._pooled_view = view
+            self._pool_view(*view)
+        super().draw(renderer, *args, **kwargs)
+
+
+def plot_unitary_events_summary(joint_surprise, t_start, t_stop, window_size,
+                                window_step, axes, significance_level=0.05,
+                                quantity='surprise', time_unit='ms',
+                                colormap=None):
+    """
+    Plots an overview of the unitary event analysis of many neuron pairs as
+    a heatmap with the pairs as rows and the analysis windows as columns.
+
+    The heatmap is downsampled to the display resolution of `axes`: each
+    pixel shows the maximum joint surprise, or the number of significant
+    windows, of the pairs and windows it covers. Only a chunk of pairs is
+    read at a time, so `joint_surprise` can be a memory-mapped array that
+    does not fit into memory. Zooming into the axes downsamples the visible
+    part again, down to single pairs and windows.
+
+    Parameters
+    ----------
+    joint_surprise : np.ndarray or str or path-like
+        The joint surprise of shape (n_pairs, n_windows), as returned by
+        :func:`stack_joint_surprise`, or the path to such an `.npy` file,
+        which is memory-mapped.
+    t_start : quantities.Quantity
+        The start time of the analyzed spike trains.
+    t_stop : quantities.Quantity
+        The stop time of the analyzed spike trains.
+    window_size : quantities.Quantity
+        The size of the analysis-window. This value should be identical to
+        the one used to generate `joint_surprise`.
+    window_step : quantities.Quantity
+        The size of the window step. This value should be identical to the
+        one used to generate `joint_surprise`.
+    axes : matplotlib.axes.Axes
+        The axes to plot into.
+    significance_level : float
+        The significance threshold of the joint surprise, used if `quantity`
+        is 'significant'.
+        Default: 0.05
+    quantity : {'surprise', 'significant'}
+        Whether the maximum joint surprise or the number of significant
+        windows is shown.
+        Default: 'surprise'
+    time_unit : str
+        The time unit of the time axis.
+        Default: 'ms'
+    colormap : str or None
+        The colormap. If None, 'coolwarm' is used for the joint surprise and
+        'viridis' for the number of significant windows.
+        Default: None
+
+    Returns
+    -------
+    image : matplotlib.image.AxesImage
+        The heatmap.
+
+    Examples
+    --------
+    >>> joint_surprise = stack_joint_surprise(
+    ...     (ue.jointJ_window_analysis(pair, 5 * pq.ms, 100 * pq.ms,
+    ...                                10 * pq.ms, [3]) for pair in pairs),
+    ...     filename='joint_surprise.npy', n_pairs=len(pairs))
+    >>> fig, axes = plt.subplots()
+    >>> plot_unitary_events_summary('joint_surprise.npy', 0 * pq.ms,
+    ...                             2100 * pq.ms, 100 * pq.ms, 10 * pq.ms,
+    ...                             axes)
+    """
+    if quantity == 'surprise':
+        threshold = None
+        label = 'Joint surprise (max)'
+    elif quantity == 'significant':
+        threshold = ue.jointJ(significance_level)
+        label = 'Significant windows'
+    else:
+        raise ValueError(f"quantity should be 'surprise' or 'significant', "
+                         f"not '{quantity}'")
+    if colormap is None:
+        colormap = 'coolwarm' if threshold is None else 'viridis'
+    if isinstance(joint_surprise, (str, os.PathLike)):
+        joint_surprise = np.load(joint_surprise, mmap_mode='r')
+    n_pairs, n_windows = joint_surprise.shape
+
+    t_winpos = ue._winpos(t_start, t_stop, window_size,
+                          window_step).rescale(time_unit).magnitude
+    if len(t_winpos) != n_windows:
+        raise ValueError(
+            f"joint_surprise has {n_windows} windows, but the window "
+            f"geometry defines {len(t_winpos)}")
+    step = window_step.rescale(time_unit).magnitude
+    # column k is centred at the centre of the k-th window
+    first_left = t_winpos[0] + window_size.rescale(time_unit).magnitude / 2. \
+        - step / 2.
+
+    image = _SummaryImage(axes, cmap=colormap, interpolation='nearest')
+    image.set_clip_path(axes.patch)
+    # sets the limits of the axes to the extent of all pairs and windows
+    image.set_summary(joint_surprise, threshold, first_left, step)
+    if threshold is None:
+        image_data = image.get_array()
+        finite = np.abs(image_data[np.isfinite(image_data)])
+        vmax = finite.max() if finite.size else 1.
+        image.set_clim(-vmax, vmax)
+    axes.add_image(image)
+    axes.set_aspect('auto')
+    axes.set_autoscale_on(False)
+    axes.figure.colorbar(image, ax=axes, label=label)
+    axes.set_xlabel(f'Time ({time_unit})')
+    axes.set_ylabel('Pair')
+    return image